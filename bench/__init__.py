@@ -0,0 +1,61 @@
+"""
+Benchmarks for the hot paths of the tf scripts
+
+Run from the repository root, for example:
+
+    python3 -m bench.partycodec
+
+The whole suite with a comparison against the stored baseline:
+
+    python3 -m bench
+"""
+from time import perf_counter
+from typing import Callable
+
+from faketf import TinyFugue, install
+
+
+def measure(fn: Callable[[], object], number: int = 10000, repeat: int = 5) -> float:
+    """
+    Best average time of a single call
+
+    :param fn: function to be called without arguments
+    :param number: calls per round
+    :param repeat: rounds, the fastest one is used
+    :returns: seconds per call
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (perf_counter() - start) / number)
+    return best
+
+
+def calibrate(fn: Callable[[], object], roundSeconds: float = 0.02) -> int:
+    """
+    Calls per round for measure() so that a round takes about roundSeconds
+    """
+    number = 1
+    while True:
+        start = perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = perf_counter() - start
+        if elapsed >= roundSeconds / 10:
+            return max(1, int(roundSeconds * number / elapsed))
+        number *= 10
+
+
+def formatTime(seconds: float) -> str:
+    if seconds < 1e-3:
+        return "{0:8.2f} us".format(seconds * 1e6)
+    return "{0:8.2f} ms".format(seconds * 1e3)
+
+
+def installTf() -> TinyFugue:
+    """
+    Make the tf scripts importable outside TinyFugue
+    """
+    return install()
@@ -0,0 +1,103 @@
+"""
+Run the benchmark suite and compare to the stored baseline
+
+    python3 -m bench [--filter NAME] [--json FILE] [--baseline FILE]
+                     [--threshold RATIO] [--floor SECONDS] [--save-baseline]
+
+Results are printed as a table and written as JSON with --json. A case is a
+regression when it is slower than the baseline by more than the threshold,
+and by more than the floor in absolute time so that the noise of cases
+under a microsecond is not reported. The exit status is 1 if there are
+regressions. The baseline is machine
+specific, save a new one with --save-baseline before comparing changes.
+"""
+from argparse import ArgumentParser
+from json import dump, load
+from os.path import dirname, exists, join
+from platform import python_version
+from sys import exit, stderr
+from typing import Dict
+
+from bench import calibrate, formatTime, measure
+from bench.suite import GROUPS, Case
+
+BASELINE_FILE = join(dirname(__file__), "baseline.json")
+
+
+def run(case: Case) -> float:
+    return measure(case.fn, calibrate(case.fn), 5)
+
+
+def main():
+    parser = ArgumentParser(prog="python3 -m bench")
+    parser.add_argument("--filter", default="", help="run cases containing this")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed slowdown, 0.25 is 25%% slower than the baseline",
+    )
+    parser.add_argument(
+        "--floor",
+        type=float,
+        default=0.5e-6,
+        help="smallest slowdown in seconds that is a regression",
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store results as the baseline"
+    )
+    args = parser.parse_args()
+
+    baseline: Dict[str, float] = {}
+    if exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = load(f)["results"]
+
+    results: Dict[str, float] = {}
+    regressions = []
+    for group in GROUPS:
+        try:
+            cases = group()
+        except Exception as e:
+            reason = "{0}: {1}".format(type(e).__name__, str(e).split("\n")[0])
+            print("skipped {0}, {1}".format(group.__name__, reason), file=stderr)
+            continue
+
+        for case in cases:
+            if args.filter not in case.name:
+                continue
+            seconds = run(case)
+            results[case.name] = seconds
+            comparison = ""
+            if case.name in baseline:
+                ratio = seconds / baseline[case.name]
+                comparison = "{0:6.2f}x baseline".format(ratio)
+                slower = seconds - baseline[case.name]
+                if ratio > 1 + args.threshold and slower > args.floor:
+                    comparison += "  REGRESSION"
+                    regressions.append(case.name)
+            print("{0:<32} {1}  {2}".format(case.name, formatTime(seconds), comparison))
+
+    output = {"python": python_version(), "results": results}
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            dump(output, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            dump(output, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("baseline saved to {0}".format(args.baseline))
+
+    if len(regressions) > 0:
+        print(
+            "{0} regressions over {1:.0%}: {2}".format(
+                len(regressions), args.threshold, ", ".join(regressions)
+            )
+        )
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
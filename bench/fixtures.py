@@ -0,0 +1,301 @@
+"""
+Generated, realistic looking data for benchmarks
+"""
+from json import dumps
+from random import Random
+from time import time
+from typing import Dict, List, Tuple
+
+from mobinfotypes import Monster
+from partytypes import Member, MemberDataSource, Place, State
+from spells import SPELLS
+
+NAMES = [
+    "Astrax",
+    "Ruska",
+    "Jacobi",
+    "Gameman",
+    "Zin",
+    "Durand",
+    "Anipa",
+    "Arakorni",
+    "Tarmo",
+    "Gorak",
+    "Vexx",
+    "Ildor",
+    "Myrtle",
+    "Qoq",
+    "Baelin",
+    "Sorcha",
+]
+
+FORMATION_PLACES = [Place(x, y) for y in range(1, 4) for x in range(1, 4)]
+
+
+def member(rng: Random, name: str, place: Place, source: MemberDataSource) -> Member:
+    maxhp = rng.randint(300, 2500)
+    maxsp = rng.randint(200, 1800)
+    return Member(
+        name,
+        rng.randint(-50, maxhp),
+        maxhp,
+        rng.randint(0, maxsp),
+        maxsp,
+        rng.randint(0, 300),
+        300,
+        place,
+        rng.random() < 0.6,
+        rng.random() < 0.1,
+        False,
+        False,
+        name == NAMES[0],
+        False,
+        rng.random() < 0.1,
+        rng.random() < 0.1,
+        False,
+        False,
+        0,
+        0,
+        None,
+        time() - rng.random() * 10,
+        source,
+    )
+
+
+def partyMembers(n: int, seed: int = 1) -> List[Member]:
+    """
+    Party of n members, first nine in formation and rest as pss minions
+    """
+    rng = Random(seed)
+    members = []
+    for i in range(n):
+        name = NAMES[i] if i < len(NAMES) else "{0}{1}".format(NAMES[i % 16], i)
+        if i < len(FORMATION_PLACES):
+            members.append(
+                member(rng, name, FORMATION_PLACES[i], MemberDataSource.BCPROXY)
+            )
+        else:
+            members.append(
+                member(rng, name, Place(6, 1), MemberDataSource.MINION_HP_STATUS)
+            )
+    return members
+
+
+def partyState(n: int = 16, seed: int = 1) -> State:
+    members = partyMembers(n, seed)
+    places = {m.place: m for m in members if m.place in FORMATION_PLACES}
+    unknownPlaces = [Place(1, 4), Place(2, 4), Place(3, 4), Place(4, 4)]
+    unknownPlaces += [Place(4, 1), Place(4, 2), Place(4, 3)]
+    rest = [m for m in members if m.place not in FORMATION_PLACES]
+    for (place, m) in zip(unknownPlaces, rest):
+        places[place] = m
+    previousPlaces = {m.name: p for (p, m) in places.items()}
+    return State(frozenset(members), places, previousPlaces, NAMES[1], False, False)
+
+
+def partyMessage(m: Member, partyName: str = "'bat boys'") -> str:
+    """
+    Batclient party status message payload (after "∴party ") for member
+    """
+    place = m.place if m.place is not None else Place(6, 1)
+    return " ".join(
+        [
+            m.name,
+            "human",
+            "male",
+            "98",
+            str(m.hp),
+            str(m.maxhp),
+            str(m.sp),
+            str(m.maxsp),
+            str(m.ep),
+            str(m.maxep),
+            partyName,
+            str(place.x),
+            str(place.y),
+            NAMES[0].lower(),
+            str(int(m.formation)),
+            str(int(m.member)),
+            str(int(m.entry)),
+            str(int(m.following)),
+            str(int(m.leader)),
+            str(int(m.linkdead)),
+            str(int(m.resting)),
+            str(int(m.idle)),
+            str(int(m.invisible)),
+            str(int(m.dead)),
+            str(m.stunned),
+            str(m.unconscious),
+            "1234567",
+            "98765432",
+            "3600",
+            "1600000000",
+        ]
+    )
+
+
+def pssMessage(m: Member, minion: bool = False) -> str:
+    """
+    JSON given by the party_pss trigger to party.pssParse for member
+    """
+    place = m.place if m.place is not None else Place(1, 1)
+    return dumps(
+        {
+            "idle": "*" if m.idle else " ",
+            "y": str(place.y),
+            "x": str(place.x),
+            "name": ("+" if minion else "") + m.name + "    ",
+            "state": "form",
+            "hp": str(m.hp),
+            "maxhp": str(m.maxhp),
+            "spepstring": "",
+            "sp": str(m.sp),
+            "maxsp": str(m.maxsp),
+            "ep": str(m.ep),
+            "maxep": str(m.maxep),
+        }
+    )
+
+
+def partyMessageStream(n: int, length: int, seed: int = 1) -> List[Tuple[str, str]]:
+    """
+    Mixed party status and pss messages of a party of n members moving
+    around in formation
+
+    :returns: list of (kind, message), kind is "party" or "pss"
+    """
+    rng = Random(seed)
+    members = partyMembers(n, seed)
+    places = FORMATION_PLACES + [Place(6, 1), Place(4, 2)]
+    stream = []
+    for _ in range(length):
+        i = rng.randrange(n)
+        m = members[i]
+        r = rng.random()
+        if r < 0.1:
+            m = m._replace(place=rng.choice(places))
+        m = m._replace(hp=max(-50, min(m.maxhp, m.hp + rng.randint(-200, 150))))
+        members[i] = m
+        if r > 0.97:
+            stream.append(("pss", pssMessage(m, i >= 9)))
+        else:
+            stream.append(("party", partyMessage(m)))
+    return stream
+
+
+MONSTER_WORDS = [
+    "orc",
+    "goblin",
+    "guard",
+    "dragon",
+    "troll",
+    "wizard",
+    "spider",
+    "skeleton",
+    "priest",
+    "merchant",
+    "rat",
+    "knight",
+]
+
+MONSTER_ADJECTIVES = [
+    "big",
+    "small",
+    "angry",
+    "ancient",
+    "sleepy",
+    "huge",
+    "black",
+    "young",
+    "scarred",
+    "wandering",
+]
+
+
+def monsterNames(n: int, seed: int = 1) -> List[str]:
+    """
+    n different monster names like in an area, many share a prefix
+    """
+    rng = Random(seed)
+    names: List[str] = []
+    while len(names) < n:
+        name = "{0} {1} {2}".format(
+            rng.choice(["A", "An", "The"]),
+            rng.choice(MONSTER_ADJECTIVES),
+            rng.choice(MONSTER_WORDS),
+        )
+        if rng.random() < 0.5:
+            name += " of the {0} {1}".format(
+                rng.choice(MONSTER_ADJECTIVES), rng.choice(MONSTER_WORDS)
+            )
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def monsters(n: int, seed: int = 1) -> Dict[str, Monster]:
+    """
+    Monster cache of an area with n monsters, keyed by name
+    """
+    rng = Random(seed)
+    spellNames = sorted(s.name for s in SPELLS)
+    result = {}
+    for (i, name) in enumerate(monsterNames(n, seed)):
+        result[name] = Monster(
+            id=i + 1,
+            name=name,
+            shortname=name.split(" ")[2],
+            race=rng.choice(["orc", "human", "troll", None]),
+            gender=rng.choice(["male", "female", "neuter", None]),
+            align=rng.choice(["good", "neutral", "evil", None]),
+            aggro=rng.random() < 0.2,
+            spells=frozenset(rng.sample(spellNames, rng.randint(0, 6))),
+            skills=frozenset(),
+            killcount=rng.randint(0, 200),
+            exp=rng.randint(100, 200000),
+            wikiexp=None,
+            room=None,
+            areaId="1",
+        )
+    return result
+
+
+def killLine(name: str, exp: int) -> str:
+    """
+    Line of `party kills` output, names are cut at 35 characters
+    """
+    return "| 12:34 {0:>7}: {1:<35} |".format(exp, name[:35])
+
+
+def combatLog(n: int, seed: int = 1) -> List[str]:
+    """
+    n lines of combat with magic words of known and unknown spells
+    """
+    rng = Random(seed)
+    casters = monsterNames(20, seed)
+    vocals = sorted(s.vocals for s in SPELLS if s.vocals != "")
+    lines = []
+    for _ in range(n):
+        caster = rng.choice(casters)
+        r = rng.random()
+        if r < 0.4:
+            words = rng.choice(vocals)
+        elif r < 0.5:
+            words = "mumbo gumbo zzt"
+        else:
+            lines.append("{0} hits you very hard.".format(caster))
+            continue
+        lines.append("{0} utters the magic words '{1}'".format(caster, words))
+    return lines
+
+
+#: ginfo output lines of one player, given to ginfo.guild one by one
+GINFO_GUILD_LINES = [
+    "Mage (acid [30], asphyxiation [20], poison)",
+    "Channellers (35/35)",
+    "Inner circle (10/10)",
+    "Psionicist (5/35)",
+    "Tarmalen (15/45)",
+    "Society levels (10)",
+    "Explorer (3)",
+]
@@ -0,0 +1,75 @@
+"""
+Party state wire format compared to dill, full states and deltas
+"""
+import dill  # type: ignore
+from time import time
+
+from bench import formatTime, measure
+from bench.fixtures import partyState
+from partytypes import (
+    decodeState,
+    decodeUpdate,
+    encodeDelta,
+    encodeKeyframe,
+    encodeState,
+    Replica,
+    State,
+)
+
+
+def hpChanged(state: State, hpdiff: int) -> State:
+    """
+    State after one member in formation lost some hp
+    """
+    (place, member) = next(iter(state.places.items()))
+    changed = member._replace(hp=member.hp - hpdiff, updatedAt=time())
+    places = dict(state.places)
+    places[place] = changed
+    members = frozenset([changed if m == member else m for m in state.members])
+    return state._replace(members=members, places=places)
+
+
+def main():
+    for n in [9, 16]:
+        state = partyState(n)
+        encoded = encodeState(state)
+        pickled = dill.dumps(state)
+        assert decodeState(encoded) == state
+        assert decodeState(pickled) == state
+
+        print("{0} members".format(n))
+        print("  size     wire {0:5} B   dill {1:5} B".format(len(encoded), len(pickled)))
+        print(
+            "  encode   wire {0}   dill {1}".format(
+                formatTime(measure(lambda: encodeState(state), 2000)),
+                formatTime(measure(lambda: dill.dumps(state), 2000)),
+            )
+        )
+        print(
+            "  decode   wire {0}   dill {1}".format(
+                formatTime(measure(lambda: decodeState(encoded), 2000)),
+                formatTime(measure(lambda: dill.loads(pickled), 2000)),
+            )
+        )
+
+        replica = decodeUpdate(None, encodeKeyframe(1, state))
+        sent = Replica(1, state)
+        changed = hpChanged(state, 3)
+        delta = encodeDelta(sent, 2, changed)
+        assert decodeUpdate(replica, delta) == Replica(2, changed)
+
+        print("  hp change delta {0:5} B".format(len(delta)))
+        print(
+            "  encode delta    {0}".format(
+                formatTime(measure(lambda: encodeDelta(sent, 2, changed), 2000))
+            )
+        )
+        print(
+            "  apply delta     {0}".format(
+                formatTime(measure(lambda: decodeUpdate(replica, delta), 2000))
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Party status message parsing with utils.split compared to shlex.split
+
+Both the tokenizer and the resulting members are checked to be the same
+as with shlex before timing.
+"""
+from random import Random
+from shlex import split as shlexSplit
+from time import perf_counter
+
+from bench import installTf
+
+installTf()
+
+import party
+from bench.fixtures import partyMessageStream
+from partytypes import Member, MemberDataSource, Place
+from utils import split, strtoi
+
+PARTY_NAMES = [
+    "'bat boys'",
+    '"bat boys"',
+    "batboys",
+    "'it''s'",
+    '"say \\"hi\\" \\\\o/"',
+    "'a \"b\" c'",
+    "bat\\ boys",
+    "''",
+]
+
+FUZZ_ALPHABET = ["a", "b", "1", " ", "  ", "\t", "'", '"', "\\", "\n", "x y", "é"]
+
+
+def referenceParseMessage(message: str) -> Member:
+    d = dict(zip(party.PARTY_STATUS_UPDATE_FIELDS, shlexSplit(message)))
+    x = strtoi(d["place_x"])
+    y = strtoi(d["place_y"])
+    place = None if x == None or y == None else Place(x, y)  # type: ignore
+    return Member(
+        str(d["player"]),
+        int(d["hp"]),
+        int(d["maxhp"]),
+        int(d["sp"]),
+        int(d["maxsp"]),
+        int(d["ep"]),
+        int(d["maxep"]),
+        place,
+        bool(d["formation"] == "1"),
+        bool(d["member"] == "1"),
+        bool(d["entry"] == "1"),
+        bool(d["following"] == "1"),
+        bool(d["leader"] == "1"),
+        bool(d["linkdead"] == "1"),
+        bool(d["resting"] == "1"),
+        bool(d["idle"] == "1"),
+        bool(d["invisible"] == "1"),
+        bool(d["dead"] == "1"),
+        int(d["stunned"]),
+        int(d["unconscious"]),
+        None,
+        0.0,
+        MemberDataSource.BCPROXY,
+    )
+
+
+def splitOrError(f, s: str):
+    try:
+        return f(s)
+    except ValueError:
+        return ValueError
+
+
+def checkSplit(cases: int) -> int:
+    rng = Random(1)
+    for _ in range(cases):
+        s = "".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 16)))
+        assert splitOrError(split, s) == splitOrError(shlexSplit, s), repr(s)
+    return cases
+
+
+def messages(n: int):
+    stream = partyMessageStream(16, n)
+    return [
+        msg.replace("'bat boys'", PARTY_NAMES[i % len(PARTY_NAMES)])
+        for (i, (kind, msg)) in enumerate(stream)
+        if kind == "party"
+    ]
+
+
+def throughput(f, msgs) -> float:
+    start = perf_counter()
+    for msg in msgs:
+        f(msg)
+    return len(msgs) / (perf_counter() - start)
+
+
+def main():
+    print("split checked against shlex: {0} fuzzed strings".format(checkSplit(100000)))
+
+    msgs = messages(20000)
+    for msg in msgs:
+        expected = referenceParseMessage(msg)
+        assert party.parseMessage(msg)._replace(updatedAt=0.0) == expected, msg
+    print("parseMessage checked against shlex: {0} messages".format(len(msgs)))
+
+    print(
+        "  split         {0:10.0f} msg/s   shlex {1:10.0f} msg/s".format(
+            throughput(split, msgs), throughput(shlexSplit, msgs)
+        )
+    )
+    print(
+        "  parseMessage  {0:10.0f} msg/s   shlex {1:10.0f} msg/s".format(
+            throughput(party.parseMessage, msgs),
+            throughput(referenceParseMessage, msgs),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
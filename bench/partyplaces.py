@@ -0,0 +1,122 @@
+"""
+party.calculatePlaces compared to the original quadratic algorithm
+
+The original is kept here as the reference: places are checked to be the
+same after every message of a generated message stream, and then both are
+timed.
+"""
+from typing import Mapping, Set
+
+from bench import formatTime, installTf, measure
+
+installTf()
+
+import party
+from bench.fixtures import partyMessageStream
+from partytypes import Member, MemberDataSource, Place, State
+
+
+def referenceCalculatePlaces(state: State) -> State:
+    noPlace: Set[Member] = set([])
+    places: Mapping[Place, Member] = {}
+
+    for member in state.members:
+        if member.place == None or member.place not in party.VALID_PLACES:
+            noPlace.add(member)
+            continue
+
+        membersInThisPlaceUpdatedAt = map(
+            lambda m: m.updatedAt,
+            filter(lambda m: m.place == member.place, state.members),
+        )
+        allMembersInThisPlaceFromBcproxy = (
+            len(
+                list(
+                    filter(
+                        lambda m: m.source == MemberDataSource.PSS
+                        and m.place == member.place,
+                        state.members,
+                    )
+                )
+            )
+            == 0
+        )
+        if member.source == MemberDataSource.PSS or (
+            allMembersInThisPlaceFromBcproxy
+            and member.updatedAt == max(membersInThisPlaceUpdatedAt)
+        ):
+            places[member.place] = member
+        else:
+            noPlace.add(member)
+
+    for member in noPlace.copy():
+        if member.name in state.previousPlaces:
+            prevPlace = state.previousPlaces[member.name]
+            if prevPlace not in places:
+                places[prevPlace] = member
+                noPlace.remove(member)
+
+    previousPlaces: Mapping[str, Place] = {}
+    for (place, member) in places.items():
+        previousPlaces[member.name] = place
+    state = state._replace(previousPlaces=previousPlaces)
+
+    for (place, member) in zip(
+        party.UNKNOWN_PLACES, sorted(noPlace, key=lambda m: m.name)
+    ):
+        places[place] = member
+
+    return state._replace(places=places)
+
+
+def isAmbiguous(state: State) -> bool:
+    """
+    The reference picks an arbitrary member for a place with several pss
+    members or several equally new bcproxy members
+    """
+    seen = set()
+    for m in state.members:
+        if m.place in party.VALID_PLACES:
+            key = (m.place, m.source == MemberDataSource.PSS or m.updatedAt)
+            if key in seen:
+                return True
+            seen.add(key)
+    return False
+
+
+def checkEquivalence(n: int, length: int) -> int:
+    party.state = State(frozenset([]), {}, {}, None, False, False)
+    party.members.clear()
+    checked = 0
+    for (kind, message) in partyMessageStream(n, length, seed=n):
+        before = party.state
+        if kind == "pss":
+            party.pssParse(message)
+        else:
+            party.triggerPartyMsg(message)
+        if isAmbiguous(party.state):
+            continue
+        expected = referenceCalculatePlaces(
+            party.state._replace(previousPlaces=before.previousPlaces)
+        )
+        assert party.state.places == expected.places, message
+        assert party.state.previousPlaces == expected.previousPlaces, message
+        checked += 1
+    return checked
+
+
+def main():
+    for n in [9, 16, 32]:
+        checked = checkEquivalence(n, 3000)
+        print("{0} members, {1} messages checked".format(n, checked))
+        state = party.state
+        print(
+            "  calculatePlaces  {0}   reference {1}".format(
+                formatTime(measure(party.calculatePlaces, 2000)),
+                formatTime(measure(lambda: referenceCalculatePlaces(state), 2000)),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+party.handleNewMember with the name-indexed member store compared to
+rebuilding the members frozenset on every update
+"""
+from bench import formatTime, installTf, measure
+
+installTf()
+
+import party
+from bench.fixtures import partyState
+from partytypes import Member, State
+
+
+def referenceUpsert(state: State, newMember: Member) -> State:
+    newMembers = set(
+        [
+            newMember if member.name == newMember.name else member
+            for member in state.members
+        ]
+    )
+    if newMember not in newMembers:
+        newMembers.add(newMember)
+    return state._replace(members=frozenset(newMembers))
+
+
+def main():
+    for n in [9, 16, 32]:
+        state = partyState(n)
+        party.state = state
+        party.members.clear()
+        for m in state.members:
+            party.members.upsert(m)
+        member = sorted(state.members)[n // 2]
+        hurt = member._replace(hp=member.hp - 3)
+
+        print("{0} members".format(n))
+        print(
+            "  upsert           store {0}   frozenset {1}".format(
+                formatTime(measure(lambda: party.members.upsert(hurt), 20000)),
+                formatTime(measure(lambda: referenceUpsert(state, hurt), 20000)),
+            )
+        )
+        print(
+            "  lookup           store {0}   scan      {1}".format(
+                formatTime(
+                    measure(lambda: party.getMemberByName(member.name), 20000)
+                ),
+                formatTime(
+                    measure(
+                        lambda: next(m for m in state.members if m.name == member.name),
+                        20000,
+                    )
+                ),
+            )
+        )
+        print(
+            "  handleNewMember  {0}".format(
+                formatTime(measure(lambda: party.handleNewMember(hurt), 2000))
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Status channel per-message latency: a new connection for every message as
+heartbeat.py and resists.py used to do, a persistent connection and the
+background Sender
+"""
+import dill  # type: ignore
+from multiprocessing import Process
+from multiprocessing.connection import Client, Listener
+from os import path
+from tempfile import mkdtemp
+from time import perf_counter, sleep
+
+from bench import formatTime, installTf, measure
+
+installTf()
+
+from sender import Sender
+from statustypes import Message, StatusType
+
+MESSAGES = 2000
+
+
+def serve(socketFile: str):
+    """
+    statusoutput.py reading loop without the drawing
+    """
+    with Listener(socketFile, "AF_UNIX") as listener:
+        while True:
+            with listener.accept() as conn:
+                while True:
+                    try:
+                        dill.loads(conn.recv_bytes())
+                    except EOFError:
+                        break
+
+
+def main():
+    socketFile = path.join(mkdtemp(), "status")
+    server = Process(target=serve, args=(socketFile,), daemon=True)
+    server.start()
+    while not path.exists(socketFile):
+        sleep(0.01)
+
+    msg = Message(StatusType.HEARTBEAT_RESET, None)
+
+    def connectPerMessage():
+        with Client(socketFile, "AF_UNIX") as conn:
+            conn.send_bytes(dill.dumps(msg))
+
+    print(
+        "  new connection per message  {0}".format(
+            formatTime(measure(connectPerMessage, MESSAGES, 3))
+        )
+    )
+
+    with Client(socketFile, "AF_UNIX") as conn:
+        print(
+            "  persistent connection       {0}".format(
+                formatTime(measure(lambda: conn.send_bytes(dill.dumps(msg)), MESSAGES, 3))
+            )
+        )
+
+    sender = Sender(socketFile, encode=dill.dumps, maxSize=MESSAGES * 3)
+    start = perf_counter()
+    for _ in range(MESSAGES):
+        sender.send(msg)
+    enqueued = perf_counter() - start
+    while sender.stats().sent < MESSAGES:
+        sleep(0.001)
+    delivered = perf_counter() - start
+    print(
+        "  sender, caller              {0}".format(formatTime(enqueued / MESSAGES))
+    )
+    print(
+        "  sender, delivered           {0}".format(formatTime(delivered / MESSAGES))
+    )
+
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
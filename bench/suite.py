@@ -0,0 +1,268 @@
+"""
+Benchmark cases for the hot parse and format paths of the tf scripts
+
+Cases are grouped by script, a group whose script cannot be loaded here is
+skipped by the runner. Run them with python3 -m bench.
+"""
+from atexit import register
+from os import close, remove
+from tempfile import mkstemp
+from typing import Callable, List, NamedTuple
+
+from bench import installTf
+from bench.fixtures import (
+    GINFO_GUILD_LINES,
+    combatLog,
+    killLine,
+    monsterNames,
+    monsters,
+    partyMessage,
+    partyMembers,
+    partyState,
+)
+
+installTf()
+
+
+class Case(NamedTuple):
+    name: str
+    fn: Callable[[], object]
+
+
+def partyCases() -> List[Case]:
+    import party
+
+    state = partyState(16)
+    party.state = state
+    party.members.clear()
+    for m in state.members:
+        party.members.upsert(m)
+    member = sorted(state.members)[5]
+    hurt = member._replace(hp=member.hp - 3)
+    message = partyMessage(member)
+
+    return [
+        Case("party.parseMessage", lambda: party.parseMessage(message)),
+        Case("party.calculatePlaces", party.calculatePlaces),
+        Case("party.handleNewMember", lambda: party.handleNewMember(hurt)),
+    ]
+
+
+def partyOutputCases() -> List[Case]:
+    import partyoutput
+
+    state = partyState(16)
+    return [
+        Case("partyoutput.getStatus", lambda: partyoutput.getStatus(state)),
+        Case(
+            "partyoutput.greenRedGradient",
+            lambda: partyoutput.greenRedGradient(1234, 2000, 50, 0.1),
+        ),
+    ]
+
+
+def mobinfoCases() -> List[Case]:
+    import mobinfo
+
+    area = monsters(300)
+    names = sorted(area.keys())
+    mobinfo.state = mobinfo.state._replace(monsters=area)
+    mobinfo.indexMonsters()
+    middle = names[len(names) // 2]
+    # shortened name shared by several monsters, one of them seen recently
+    shortened = middle[:5]
+    mobinfo.state.lastSeen.put(middle, 1.0)
+    # not in the area, buffered until the end of party kills
+    unknownKill = killLine("A monster from another area", 1234)
+
+    def updateExp():
+        mobinfo.updateExp(unknownKill)
+        mobinfo.state.pendingKills.clear()
+
+    return [
+        Case(
+            "mobinfo.parseName",
+            lambda: mobinfo.parseName("(" + middle + " <cyan and blue aura>)"),
+        ),
+        Case("mobinfo.monsterIndex", lambda: mobinfo.monsterIndex(middle)),
+        Case("mobinfo.monsterFromIndex", lambda: mobinfo.monsterFromIndex(150)),
+        Case("mobinfo.matchKillName", lambda: mobinfo.matchKillName(shortened)),
+        Case("mobinfo.updateExp", updateExp),
+    ]
+
+
+#: scratch PostgreSQL database for the store cases, skipped if unavailable
+BENCH_POSTGRES = "dbname=mobinfo_bench"
+
+
+def storeCases(label: str, store) -> List[Case]:
+    """
+    Same cases for each mobinfo store, an area of 300 monsters with kills
+    """
+    conn = store.connect()
+    cursor = conn.cursor()
+    store.createSchema(cursor)
+    (areaId, _, isNew) = store.queryArea(cursor, "bench area")
+    if isNew:
+        ids = [
+            store.insertMonster(cursor, name, areaId, None)
+            for name in monsterNames(300)
+        ]
+        kills = [(id, 1000 * (i % 7)) for id in ids for i in range(10)]
+        store.insertKills(cursor, kills)
+    conn.commit()
+    (_, area, _) = store.queryArea(cursor, "bench area")
+    # listed again by party kills, nothing is inserted
+    listed = [(m.id, 1000) for m in list(area.values())[:20]]
+
+    return [
+        Case(
+            "mobinfostore.{0}.queryArea".format(label),
+            lambda: store.queryArea(cursor, "bench area"),
+        ),
+        Case(
+            "mobinfostore.{0}.insertKills".format(label),
+            lambda: store.insertKills(cursor, listed),
+        ),
+    ]
+
+
+def sqliteStoreCases() -> List[Case]:
+    from mobinfostore import SqliteStore
+
+    return storeCases("sqlite", SqliteStore(":memory:"))
+
+
+def postgresStoreCases() -> List[Case]:
+    from mobinfostore import PostgresStore
+
+    return storeCases("postgres", PostgresStore(BENCH_POSTGRES))
+
+
+def journalCases() -> List[Case]:
+    """
+    Replay of a mobinfo journal of 1000 writes into SQLite, rolled back
+    """
+    from dbworker import Journal
+    from mobinfostore import SqliteStore
+
+    store = SqliteStore(":memory:")
+    conn = store.connect()
+    cursor = conn.cursor()
+    store.createSchema(cursor)
+    conn.commit()
+
+    (fd, path) = mkstemp(suffix=".journal")
+    close(fd)
+    register(remove, path)
+    journal = Journal(
+        path,
+        lambda cursor, op, args: getattr(store, op)(cursor, *args),
+        bulkOps=frozenset(["insertKills"]),
+    )
+    for i in range(1000):
+        if i % 4 == 0:
+            journal.append(("updateAlignment", [i, "good"]))
+        elif i % 4 == 1:
+            journal.append(("insertLevel", [i, 100, "easy", 1000.0 + i]))
+        else:
+            journal.append(("insertKills", [[[i % 50, 1000 * i]]]))
+
+    def replay():
+        (entries, _) = journal.read()
+        journal.replay(cursor, entries)
+        conn.rollback()
+
+    return [
+        Case("dbworker.journalRead", journal.read),
+        Case("dbworker.journalReplay", replay),
+    ]
+
+
+def spellsCases() -> List[Case]:
+    import spells
+
+    names = [
+        "acid blast",
+        "Disruption",
+        "noxious haze",
+        "magic missile",
+        "banish",
+        "heal self",
+        "unknown spell",
+    ]
+    return [
+        Case("spells.getSpellByName", lambda: spells.getSpellByName("acid blast")),
+        Case(
+            "spells.getSpellByType",
+            lambda: spells.getSpellByType(
+                spells.DamType.FIRE, spells.SpellType.MAGE_AREA_1
+            ),
+        ),
+        Case(
+            "spells.spellOfVocals",
+            lambda: spells.REGISTRY.spellOfVocals("fzz mar nak grttzt"),
+        ),
+        Case("spells.organizeSpells", lambda: spells.organizeSpells(names)),
+    ]
+
+
+def vocalsCases() -> List[Case]:
+    import vocals
+
+    log = combatLog(1000)
+    line = next(line for line in log if "utters" in line)
+    return [
+        Case("vocals.recognize", lambda: vocals.recognize(line)),
+        # whole log, most lines are not magic words
+        Case("vocals.recognizeLog", lambda: [vocals.recognize(l) for l in log]),
+    ]
+
+
+def ginfoCases() -> List[Case]:
+    import ginfo
+
+    def guilds():
+        ginfo.state = ginfo.state._replace(guilds=set())
+        for line in GINFO_GUILD_LINES:
+            ginfo.guild(line)
+
+    guilds()
+    ginfo.state = ginfo.state._replace(
+        player="Ruska",
+        background="Magical",
+        level="100",
+        race="human",
+        birth="ancient",
+        country="Finland",
+    )
+    return [
+        Case("ginfo.guild", guilds),
+        Case("ginfo.toString", ginfo.toString),
+    ]
+
+
+def utilsCases() -> List[Case]:
+    from utils import GREEN, colorize, textdecode
+
+    encoded = "Ruska_39_s_32_party_32_of_32_doom"
+    name = partyMembers(1)[0].name
+    return [
+        Case("utils.textdecode", lambda: textdecode(encoded)),
+        Case("utils.colorize", lambda: colorize(name, GREEN)),
+    ]
+
+
+#: all benchmark groups, each returns its cases after setting up fixtures
+GROUPS: List[Callable[[], List[Case]]] = [
+    partyCases,
+    partyOutputCases,
+    mobinfoCases,
+    sqliteStoreCases,
+    postgresStoreCases,
+    journalCases,
+    spellsCases,
+    vocalsCases,
+    ginfoCases,
+    utilsCases,
+]
@@ -1,5 +1,4 @@
 import dill  # type: ignore
-from multiprocessing.connection import Client
 from os import getuid
 from tf import eval as tfeval  # type: ignore
 from typing import (
@@ -32,12 +31,13 @@ from spells import (
     Spell,
     SpellType,
 )
+from sender import QueuePolicy, Sender
 from tfutils import tfprint
 from utils import flatten, NoValue
 
 
 SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-caster".format(getuid())
-CONN = Client(SOCKET_FILE, "AF_UNIX")
+CONN = Sender(SOCKET_FILE, QueuePolicy.COALESCE_LATEST, encode=dill.dumps)
 
 
 def changeCategory(category_raw: str):
@@ -45,7 +45,7 @@ def changeCategory(category_raw: str):
     cat = category_raw.upper()
     category = Category[cat]
     state = state._replace(category=category)
-    CONN.send_bytes(dill.dumps(state))
+    CONN.send(state)
 
 
 def castString(spell: Spell, atTarget: bool, target: Optional[str]):
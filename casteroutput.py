@@ -1,5 +1,4 @@
 import dill  # type: ignore
-from multiprocessing.connection import Listener
 from os import getuid
 from typing import cast, Callable, Optional
 
@@ -20,6 +19,8 @@ from spells import (
     getDamtypeColor,
     Spell,
 )
+from outputserver import Connection, listen, Pane
+from screen import Screen
 from utils import Color, colorize
 
 
@@ -27,10 +28,11 @@ SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-caster".format(getuid())
 
 YELLOW = Color(0xFF, 0xFF, 0)
 
+SCREEN = Screen()
+
 
 def draw(s):
-    print("\033c", end="")  # clear screen
-    print(s)
+    SCREEN.draw([[line] for line in s.split("\n")])
 
 
 def categoryBindHelp(category: Category, categoryBinds: CategoryBinds) -> str:
@@ -85,24 +87,26 @@ def categorySpellsHelp(
     )
 
 
-with Listener(SOCKET_FILE, "AF_UNIX") as listener:
-    print("listening to connections on {0}".format(SOCKET_FILE))
-
-    while True:
-        with listener.accept() as conn:
-            print("connection opened", listener.last_accepted)
-
-            while True:
-                try:
-                    state = cast(State, dill.loads(conn.recv_bytes()))
-                    helptext = (
-                        categoryBindHelp(state.category, state.categoryBinds)
-                        + "\n"
-                        + categorySpellsHelp(
-                            state.category, state.spellsForCategory, state.spellBinds
-                        )
-                    )
-                    draw(helptext)
-                except EOFError:
-                    print("connection closed")
-                    break
+class CasterPane(Pane):
+    def connected(self, conn: Connection):
+        self.log("connection {0} opened".format(conn.number))
+
+    def received(self, conn: Connection, data: bytes):
+        state = cast(State, dill.loads(data))
+        helptext = (
+            categoryBindHelp(state.category, state.categoryBinds)
+            + "\n"
+            + categorySpellsHelp(
+                state.category, state.spellsForCategory, state.spellBinds
+            )
+        )
+        draw(helptext)
+
+    def closed(self, conn: Connection):
+        self.log("connection {0} closed".format(conn.number))
+
+
+PANE = CasterPane(SOCKET_FILE, SCREEN)
+
+if __name__ == "__main__":
+    listen(PANE)
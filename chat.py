@@ -1,11 +1,11 @@
-from multiprocessing.connection import Client
 from os import getuid
 from tf import eval  # type: ignore
 
+from sender import Sender
 from tfutils import tfprint
 
 SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-chat".format(getuid())
-CONN = Client(SOCKET_FILE, "AF_UNIX")
+CONN = Sender(SOCKET_FILE)
 
 
 def trigger(msg: str):
@@ -1,19 +1,23 @@
-from multiprocessing.connection import Listener
 from os import getuid
+from pickle import loads
+
+from outputserver import Connection, listen, Pane
 
 SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-chat".format(getuid())
 
-with Listener(SOCKET_FILE, "AF_UNIX") as listener:
-    print("listening to connections on {0}".format(SOCKET_FILE))
 
-    while True:
-        with listener.accept() as conn:
-            print("connection opened", listener.last_accepted)
+class ChatPane(Pane):
+    def connected(self, conn: Connection):
+        self.log("connection {0} opened".format(conn.number))
+
+    def received(self, conn: Connection, data: bytes):
+        print(loads(data), file=self.out)
+
+    def closed(self, conn: Connection):
+        self.log("connection {0} closed".format(conn.number))
+
+
+PANE = ChatPane(SOCKET_FILE)
 
-            while True:
-                try:
-                    msg = conn.recv()
-                    print(msg)
-                except EOFError:
-                    print("connection closed")
-                    break
+if __name__ == "__main__":
+    listen(PANE)
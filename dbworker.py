@@ -0,0 +1,430 @@
+from collections import deque
+from json import dumps, loads
+from os import fsync
+from os.path import exists, getsize
+from threading import Condition, Thread
+from tf import eval as tfeval  # type: ignore
+from time import monotonic, sleep
+from traceback import format_exception_only
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    FrozenSet,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
+
+from tfutils import tfprint
+
+
+class Command(NamedTuple):
+    #: called in the worker thread with a cursor
+    fn: Callable[[Any], Any]
+    #: called in the TinyFugue thread with the result of fn
+    callback: Optional[Callable[[Any], None]]
+    #: operation name and arguments of a write that can be journaled
+    entry: Optional["JournalEntry"]
+    #: called in the TinyFugue thread with the error if fn fails
+    errback: Optional[Callable[[BaseException], None]] = None
+
+
+#: operation name and its arguments, JSON serializable
+JournalEntry = Tuple[str, Sequence[Any]]
+
+
+class Journal:
+    """
+    Append-only file of the writes made while the database is unavailable
+
+    One entry per line as a compact JSON array [op, args]. Entries are
+    replayed in order with apply(cursor, op, args) once the connection
+    returns, so the operations must be idempotent: a crash after the commit
+    but before the file is truncated replays them again.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        apply: Callable[[Any, str, Sequence[Any]], None],
+        bulkOps: FrozenSet[str] = frozenset(),
+    ):
+        """
+        :param apply: runs one operation with a cursor
+        :param bulkOps: operations whose only argument is a list, consecutive
+                        ones are applied once with the lists concatenated
+        """
+        self.path = path
+        self.apply = apply
+        self.bulkOps = bulkOps
+
+    def append(self, entry: JournalEntry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(dumps(entry, separators=(",", ":")) + "\n")
+            f.flush()
+            fsync(f.fileno())
+
+    def size(self) -> int:
+        return getsize(self.path) if exists(self.path) else 0
+
+    def read(self, offset: int = 0) -> Tuple[List[JournalEntry], int]:
+        """
+        :returns: entries after the offset and the offset of their end, a
+                  line cut short by a crash is skipped
+        """
+        if not exists(self.path):
+            return ([], offset)
+        entries = []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                try:
+                    (op, args) = loads(line)
+                except ValueError:
+                    continue
+                entries.append((op, args))
+        return (entries, offset)
+
+    def replay(self, cursor, entries: List[JournalEntry]):
+        i = 0
+        while i < len(entries):
+            (op, args) = entries[i]
+            i += 1
+            if op in self.bulkOps:
+                values = list(args[0])
+                while i < len(entries) and entries[i][0] == op:
+                    values.extend(entries[i][1][0])
+                    i += 1
+                args = [values]
+            self.apply(cursor, op, args)
+
+    def truncate(self):
+        open(self.path, "w").close()
+
+
+class DbStats(NamedTuple):
+    queued: int
+    maxQueued: int
+    commands: int
+    batches: int
+    errors: int
+    connects: int
+    #: writes appended to the journal and replayed from it
+    journaled: int
+    replayed: int
+
+
+class DbWorker:
+    """
+    Database connection owned by a background thread
+
+    Trigger handlers enqueue writes and reads, they never wait for the
+    database. Commands queued within the batch window are run in one
+    transaction. Results of reads are given to callbacks in the TinyFugue
+    thread when runCallbacks() is called, e.g. from the prompt hook.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        batchSeconds: float = 0.05,
+        maxBatch: int = 100,
+        connectionErrors: Tuple[Type[BaseException], ...] = (OSError,),
+        retrySeconds: float = 5.0,
+        onConnect: Optional[Callable[[Any], None]] = None,
+        journal: Optional[Journal] = None,
+    ):
+        """
+        :param connect: called in the worker thread to get a DB-API connection
+        :param batchSeconds: wait this long for more commands to the same
+                             transaction after the first one
+        :param maxBatch: maximum number of commands in a transaction
+        :param connectionErrors: errors after which the connection is opened
+                                 again and the commands are retried
+        :param retrySeconds: wait between connection attempts
+        :param onConnect: called with a cursor after each connect, e.g. to
+                          create the schema
+        :param journal: writes with an entry are appended here while the
+                        database is unavailable, and replayed on connect
+        """
+        self.connect = connect
+        self.batchSeconds = batchSeconds
+        self.maxBatch = maxBatch
+        self.connectionErrors = connectionErrors
+        self.retrySeconds = retrySeconds
+        self.onConnect = onConnect
+        self.journal = journal
+
+        self.queue: Deque[Command] = deque()
+        self.condition = Condition()
+        self.busy = False
+        self.conn: Any = None
+        #: connected and the journal has been replayed
+        self.available = False
+        #: callbacks with results, and error messages, for the tf thread
+        self.results: Deque[Tuple[Optional[Callable[[Any], None]], Any]] = deque()
+        self.errorMessages: Deque[str] = deque()
+        self.maxQueued = 0
+        self.commands = 0
+        self.batches = 0
+        self.errors = 0
+        self.connects = 0
+        self.journaled = 0
+        self.replayed = 0
+
+        self.thread = Thread(target=self._run, name="dbworker")
+        self.thread.daemon = True
+        self.thread.start()
+        WORKERS.append(self)
+
+    def call(
+        self,
+        fn: Callable[[Any], Any],
+        callback: Optional[Callable[[Any], None]],
+        entry: Optional[JournalEntry] = None,
+        errback: Optional[Callable[[BaseException], None]] = None,
+    ) -> bool:
+        """
+        Enqueue fn to be run with a cursor in the worker thread, callback is
+        called with its result from runCallbacks()
+
+        :param entry: the same write for the journal
+        :param errback: called from runCallbacks() instead of callback if fn
+                        fails, errors of the connection are retried instead
+        :returns: False if the write went to the journal instead, its
+                  callback is not called
+        """
+        with self.condition:
+            if not self.available and self.journal is not None and entry is not None:
+                self.journal.append(entry)
+                self.journaled += 1
+                return False
+            self.queue.append(Command(fn, callback, entry, errback))
+            self.maxQueued = max(self.maxQueued, len(self.queue))
+            self.condition.notify_all()
+            return True
+
+    def runCallbacks(self):
+        """
+        Give the completed results to their callbacks, call from tf thread
+        """
+        while len(self.errorMessages) > 0:
+            tfprint(self.errorMessages.popleft())
+        while len(self.results) > 0:
+            (callback, result) = self.results.popleft()
+            if callback is not None:
+                callback(result)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until the queued commands have been committed
+
+        :returns: False if they were not committed before the timeout
+        """
+        deadline = monotonic() + timeout
+        with self.condition:
+            while len(self.queue) > 0 or self.busy:
+                if monotonic() >= deadline:
+                    return False
+                self.condition.wait(deadline - monotonic())
+        return True
+
+    def stats(self) -> DbStats:
+        with self.condition:
+            return DbStats(
+                len(self.queue),
+                self.maxQueued,
+                self.commands,
+                self.batches,
+                self.errors,
+                self.connects,
+                self.journaled,
+                self.replayed,
+            )
+
+    def _connect(self):
+        while self.conn is None:
+            try:
+                self.conn = self.connect()
+                self.connects += 1
+            except self.connectionErrors:
+                sleep(self.retrySeconds)
+                continue
+            except Exception as e:
+                # e.g. a bad connection string, reported but retried as the
+                # worker thread must not end
+                self._error(e)
+                sleep(self.retrySeconds)
+                continue
+
+            if self.onConnect is not None:
+                try:
+                    self.onConnect(self.conn.cursor())
+                    self.conn.commit()
+                except self.connectionErrors:
+                    raise
+                except Exception as e:
+                    self.conn.rollback()
+                    self._error(e)
+            if self.journal is not None:
+                self._replay(self.journal)
+            else:
+                with self.condition:
+                    self.available = True
+
+    def _replay(self, journal: Journal):
+        """
+        Apply the journal in one transaction per read, until nothing more was
+        appended while replaying
+
+        The worker becomes available under the same lock as the journal is
+        truncated, so call() can't append to the journal in between.
+        """
+        offset = 0
+        while True:
+            (entries, offset) = journal.read(offset)
+            try:
+                journal.replay(self.conn.cursor(), entries)
+                self.conn.commit()
+            except self.connectionErrors:
+                raise
+            except Exception:
+                # skip the entries that fail
+                self.conn.rollback()
+                for entry in entries:
+                    try:
+                        journal.replay(self.conn.cursor(), [entry])
+                        self.conn.commit()
+                    except self.connectionErrors:
+                        raise
+                    except Exception as e:
+                        self.conn.rollback()
+                        self._error(e)
+            self.replayed += len(entries)
+            with self.condition:
+                if journal.size() <= offset:
+                    if offset > 0:
+                        journal.truncate()
+                    self.available = True
+                    return
+
+    def _lost(self, e: BaseException, batch: List[Command]):
+        """
+        Connection is lost, journal the writes of the failed batch and the
+        queue, the other commands are retried with a new connection
+        """
+        self._error(e)
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        self.conn = None
+        with self.condition:
+            self.available = False
+            commands = batch + list(self.queue)
+            self.queue.clear()
+            for command in commands:
+                if self.journal is not None and command.entry is not None:
+                    self.journal.append(command.entry)
+                    self.journaled += 1
+                else:
+                    self.queue.append(command)
+        sleep(self.retrySeconds)
+
+    def _error(self, e: BaseException):
+        self.errors += 1
+        self.errorMessages.append(
+            "Database error: " + "".join(format_exception_only(type(e), e)).strip()
+        )
+
+    def _execute(self, batch: List[Command]):
+        """
+        Run the batch in one transaction, if one of the commands fails the
+        others are run again one by one
+        """
+        results = []
+        try:
+            cursor = self.conn.cursor()
+            for command in batch:
+                results.append(command.fn(cursor))
+            self.conn.commit()
+        except self.connectionErrors:
+            raise
+        except Exception as e:
+            self.conn.rollback()
+            if len(batch) == 1:
+                self._error(e)
+                if batch[0].errback is not None:
+                    self.results.append((batch[0].errback, e))
+            else:
+                for command in batch:
+                    self._execute([command])
+            return
+
+        self.commands += len(batch)
+        self.batches += 1
+        for (command, result) in zip(batch, results):
+            self.results.append((command.callback, result))
+
+    def _run(self):
+        while True:
+            try:
+                self._connect()
+            except self.connectionErrors as e:
+                self._lost(e, [])
+                continue
+
+            with self.condition:
+                while len(self.queue) == 0:
+                    self.condition.wait()
+                deadline = monotonic() + self.batchSeconds
+                while len(self.queue) < self.maxBatch and monotonic() < deadline:
+                    self.condition.wait(deadline - monotonic())
+                batch = [
+                    self.queue.popleft()
+                    for _ in range(min(self.maxBatch, len(self.queue)))
+                ]
+                self.busy = True
+
+            try:
+                self._execute(batch)
+            except self.connectionErrors as e:
+                self._lost(e, batch)
+
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+
+#: all database workers of this tf session, for db_stats
+WORKERS: List[DbWorker] = []
+
+
+def printStats(s: str):
+    for worker in WORKERS:
+        stats = worker.stats()
+        tfprint(
+            "{0} queued (max {1}), {2} commands in {3} transactions, "
+            "{4} errors, {5} connects, {6} journaled, {7} replayed".format(
+                stats.queued,
+                stats.maxQueued,
+                stats.commands,
+                stats.batches,
+                stats.errors,
+                stats.connects,
+                stats.journaled,
+                stats.replayed,
+            )
+        )
+
+
+def setup():
+    tfeval("/def db_stats = /python_call dbworker.printStats")
+
+
+setup()
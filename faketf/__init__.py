@@ -0,0 +1,516 @@
+"""
+Headless stand-in for TinyFugue's tf module
+
+Records the /def, /edit and /undef commands the scripts give in their setup()
+and dispatches lines, prompts and keys to the Python handlers the way
+TinyFugue would. Enough of TinyFugue is emulated for the scripts of this
+repository: glob, simple and regexp triggers with priorities, fall-through,
+chance and shots, hooks, keybindings, positional and regexp substitutions
+and /python_call. Other commands are counted in unsupported.
+
+    import faketf
+    tf = faketf.install()
+    import party
+    tf.line("∴party 1 ...")
+"""
+from importlib import import_module, reload
+from random import randrange
+from re import DOTALL, IGNORECASE, Match, Pattern
+from re import compile as reCompile
+from re import escape
+from sys import modules
+from time import perf_counter
+from traceback import format_exc
+from types import ModuleType
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from utils import NoValue
+
+
+class Matching(NoValue):
+    GLOB = "glob"
+    SIMPLE = "simple"
+    REGEXP = "regexp"
+
+
+class Macro(NamedTuple):
+    name: str
+    body: str
+    matching: Matching
+    #: trigger pattern, None for macros that are not triggers
+    trigger: Optional[str]
+    #: compiled trigger or hook pattern
+    pattern: Optional[Pattern]
+    #: hook event name and pattern
+    hook: Optional[Tuple[str, str]]
+    bind: Optional[str]
+    priority: int
+    fallthrough: bool
+    #: percentage of matches that execute the macro
+    chance: int
+    #: executions left before the macro is undefined, 0 for unlimited
+    shots: int
+    attrs: str
+    #: definition order for macros of the same priority
+    number: int
+
+
+class Timing(NamedTuple):
+    calls: int
+    seconds: float
+    maxSeconds: float
+
+
+class Context(NamedTuple):
+    """
+    What the substitutions of an executed macro body refer to
+    """
+
+    text: str
+    match: Optional[Match] = None
+
+
+#: options of /def and /edit that take an argument
+ARG_OPTIONS = "abcEhmnpPstTw"
+
+#: one substitution or escape of a macro body
+SUBSTITUTION_RE = reCompile(
+    r"\\(.)|%(;)|(%)%|%\{([^}]*)\}|%(\*|-?L?[0-9]+|-?L|P(?:[0-9]+|L|R))", DOTALL
+)
+WORD_RE = reCompile(r"\S+")
+ATTRIBUTE_RE = reCompile(r"@\{[^}]*\}")
+
+
+def globToRegexp(glob: str) -> Pattern:
+    """
+    tf glob: * and ? wildcards, [] character classes and {a|b} alternatives,
+    case insensitive and matching the whole text
+    """
+    out = []
+    i = 0
+    while i < len(glob):
+        c = glob[i]
+        if c == "*":
+            out.append(".*")
+        elif c == "?":
+            out.append(".")
+        elif c == "\\" and i + 1 < len(glob):
+            i += 1
+            out.append(escape(glob[i]))
+        elif c == "[" and "]" in glob[i + 1 :]:
+            end = glob.index("]", i + 2 if glob[i + 1] in "^]" else i + 1)
+            out.append("[" + glob[i + 1 : end].replace("\\", "\\\\") + "]")
+            i = end
+        elif c == "{" and "}" in glob[i + 1 :]:
+            end = glob.index("}", i)
+            out.append(
+                "(?:" + "|".join(escape(w) for w in glob[i + 1 : end].split("|")) + ")"
+            )
+            i = end
+        else:
+            out.append(escape(c))
+        i += 1
+    return reCompile("".join(out) + r"\Z", IGNORECASE | DOTALL)
+
+
+def quoted(s: str, start: int) -> Tuple[str, int]:
+    """
+    Quoted option argument starting at start, backslash escapes the quote
+
+    :returns: the argument and the index after the closing quote
+    """
+    quote = s[start]
+    parts = []
+    i = start + 1
+    while s[i] != quote:
+        if s[i] == "\\" and s[i + 1] == quote:
+            i += 1
+        parts.append(s[i])
+        i += 1
+    return ("".join(parts), i + 1)
+
+
+def parseOptions(s: str) -> Tuple[Dict[str, str], str]:
+    """
+    Options of /def and /edit
+
+    :returns: options by letter, "" for flags, and the rest of the command
+    """
+    options: Dict[str, str] = {}
+    i = 0
+    while i < len(s):
+        while i < len(s) and s[i] == " ":
+            i += 1
+        if i + 1 >= len(s) or s[i] != "-" or s[i + 1] == " ":
+            break
+        i += 1
+        while i < len(s) and s[i] != " ":
+            letter = s[i]
+            i += 1
+            if letter not in ARG_OPTIONS:
+                options[letter] = ""
+                continue
+            if i < len(s) and s[i] in "`'\"":
+                (options[letter], i) = quoted(s, i)
+            else:
+                end = s.find(" ", i)
+                end = len(s) if end == -1 else end
+                options[letter] = s[i:end]
+                i = end
+            break
+    return (options, s[i:])
+
+
+def positional(text: str, spec: str) -> str:
+    """
+    %1, %-1, %L1 and %-L1 from the words of text
+    """
+    words = list(WORD_RE.finditer(text))
+    rest = spec.startswith("-")
+    spec = spec.lstrip("-")
+    fromEnd = spec.startswith("L")
+    n = int(spec.lstrip("L") or "1")
+    if fromEnd:
+        if rest:
+            return text[: words[-n - 1].end()] if n < len(words) else ""
+        return words[-n].group() if 0 < n <= len(words) else ""
+    if rest:
+        return text[words[n].start() :] if n < len(words) else ""
+    if n == 0:
+        return ""
+    return words[n - 1].group() if n <= len(words) else ""
+
+
+def substitute(context: Context, spec: str) -> str:
+    if spec == "*":
+        return context.text
+    if spec.startswith("P"):
+        match = context.match
+        if match is None:
+            return ""
+        if spec == "PL":
+            return match.string[: match.start()]
+        if spec == "PR":
+            return match.string[match.end() :]
+        n = int(spec[1:])
+        return (match.group(n) or "") if n <= len(match.groups()) else ""
+    if spec[-1:].isdigit() or spec.endswith("L"):
+        return positional(context.text, spec)
+    # variables are not emulated
+    return ""
+
+
+def expand(body: str, context: Context) -> List[str]:
+    """
+    Body of an executed macro with substitutions done, split into commands
+    """
+    commands = []
+    parts = []
+    i = 0
+    for match in SUBSTITUTION_RE.finditer(body):
+        parts.append(body[i : match.start()])
+        (escaped, separator, percent, braced, spec) = match.groups()
+        if escaped is not None:
+            parts.append(escaped)
+        elif separator is not None:
+            commands.append("".join(parts))
+            parts = []
+        elif percent is not None:
+            parts.append(percent)
+        else:
+            parts.append(substitute(context, braced if spec is None else spec))
+        i = match.end()
+    parts.append(body[i:])
+    commands.append("".join(parts))
+    return commands
+
+
+class TinyFugue:
+    def __init__(self, display: Optional[Callable[[str], None]] = None):
+        """
+        :param display: called with the lines TinyFugue would show, gagged
+                        lines are not shown
+        """
+        self.display = display
+        self.macros: Dict[str, Macro] = {}
+        self.triggers: Optional[List[Macro]] = None
+        self.macroNumber = 0
+        #: commands sent to the mud
+        self.sent: List[str] = []
+        self.timings: Dict[str, Timing] = {}
+        self.errors: List[str] = []
+        #: counts of commands that are not emulated
+        self.unsupported: Dict[str, int] = {}
+        #: text of the line being processed, /substitute replaces it
+        self.current: Optional[str] = None
+
+    def eval(self, cmd: str):
+        for c in expand(cmd, Context("")):
+            self.execute(c)
+
+    def out(self, s: str):
+        self.show(s)
+
+    def err(self, s: str):
+        self.show(s)
+
+    def show(self, s: str):
+        if self.display is not None:
+            self.display(s)
+
+    def install(self):
+        tf = ModuleType("tf")
+        tf.eval = self.eval  # type: ignore
+        tf.out = self.out  # type: ignore
+        tf.err = self.err  # type: ignore
+        modules["tf"] = tf
+
+    def resetStats(self):
+        self.sent = []
+        self.timings = {}
+        self.errors = []
+        self.unsupported = {}
+
+    def execute(self, cmd: str):
+        """
+        One command after substitutions
+        """
+        if not cmd.startswith("/"):
+            if cmd.strip() != "":
+                self.sent.append(cmd)
+            return
+
+        (name, _, args) = cmd[1:].partition(" ")
+        builtin = BUILTINS.get(name)
+        if builtin is not None:
+            builtin(self, args)
+        elif name in self.macros:
+            self.run(self.macros[name], Context(args))
+        else:
+            self.unsupported[name] = self.unsupported.get(name, 0) + 1
+
+    def run(self, macro: Macro, context: Context):
+        for cmd in expand(macro.body, context):
+            self.execute(cmd.lstrip(" "))
+
+    def define(self, args: str):
+        (options, rest) = parseOptions(args)
+        (name, _, body) = rest.partition("=")
+        name = name.strip()
+        if name == "":
+            name = "#{0}".format(self.macroNumber)
+        self.macroNumber += 1
+
+        matching = Matching(options.get("m", "glob"))
+        trigger = options.get("t")
+        hook = None
+        if "h" in options:
+            (event, _, hookPattern) = options["h"].partition(" ")
+            hook = (event.upper(), hookPattern)
+        self.macros[name] = Macro(
+            name=name,
+            body=body.lstrip(" "),
+            matching=matching,
+            trigger=trigger,
+            pattern=None,
+            hook=hook,
+            bind=options.get("b"),
+            priority=int(options.get("p", "1")),
+            fallthrough="F" in options,
+            chance=int(options.get("c", "100")),
+            shots=int(options.get("n", "0")),
+            attrs=options.get("a", ""),
+            number=self.macroNumber,
+        )
+        self.compile(name)
+
+    def edit(self, args: str):
+        (options, rest) = parseOptions(args)
+        name = rest.strip()
+        macro = self.macros.get(name)
+        if macro is None:
+            self.errors.append("/edit: no macro " + name)
+            return
+
+        changes: Dict[str, object] = {}
+        if "m" in options:
+            changes["matching"] = Matching(options["m"])
+        if "t" in options:
+            changes["trigger"] = options["t"]
+        if "p" in options:
+            changes["priority"] = int(options["p"])
+        if "c" in options:
+            changes["chance"] = int(options["c"])
+        if "n" in options:
+            changes["shots"] = int(options["n"])
+        if "a" in options:
+            changes["attrs"] = options["a"]
+        if "F" in options:
+            changes["fallthrough"] = True
+        if "f" in options:
+            changes["fallthrough"] = False
+        self.macros[name] = macro._replace(**changes)  # type: ignore
+        self.compile(name)
+
+    def undefine(self, args: str):
+        for name in args.split():
+            self.macros.pop(name, None)
+        self.triggers = None
+
+    def compile(self, name: str):
+        macro = self.macros[name]
+        pattern = macro.trigger
+        if macro.hook is not None:
+            pattern = macro.hook[1]
+        compiled = None
+        if pattern is not None:
+            if macro.matching == Matching.GLOB:
+                compiled = globToRegexp(pattern)
+            elif macro.matching == Matching.REGEXP:
+                compiled = reCompile(pattern)
+        self.macros[name] = macro._replace(pattern=compiled)
+        self.triggers = None
+
+    def matches(self, macro: Macro, text: str) -> Tuple[bool, Optional[Match]]:
+        if macro.matching == Matching.SIMPLE:
+            return (text == (macro.trigger or ""), None)
+        assert macro.pattern is not None
+        if macro.matching == Matching.GLOB:
+            return (macro.pattern.match(text) is not None, None)
+        match = macro.pattern.search(text)
+        return (match is not None, match)
+
+    def fire(self, macros: List[Macro], text: str) -> bool:
+        """
+        Execute the fall-through macros matching text and the first
+        non-fall-through one, in the order of priority. Matching is done
+        before executing any of them like TinyFugue does.
+
+        :returns: whether the text is to be gagged
+        """
+        selected = []
+        for macro in macros:
+            if macro.chance <= 0:
+                continue
+            (matched, match) = self.matches(macro, text)
+            if not matched:
+                continue
+            if macro.chance < 100 and randrange(100) >= macro.chance:
+                continue
+            selected.append((macro, match))
+            if not macro.fallthrough:
+                break
+
+        gag = False
+        for (macro, match) in selected:
+            if macro.shots == 1:
+                self.undefine(macro.name)
+            elif macro.shots > 1:
+                self.macros[macro.name] = macro._replace(shots=macro.shots - 1)
+                self.triggers = None
+            gag = gag or "g" in macro.attrs
+            self.run(macro, Context(text, match))
+        return gag
+
+    def sortedTriggers(self) -> List[Macro]:
+        if self.triggers is None:
+            self.triggers = sorted(
+                (m for m in self.macros.values() if m.trigger is not None),
+                key=lambda m: (-m.priority, not m.fallthrough, -m.number),
+            )
+        return self.triggers
+
+    def line(self, text: str):
+        """
+        A line received from the mud
+        """
+        previous = self.current
+        self.current = text
+        gag = self.fire(self.sortedTriggers(), text)
+        if not gag:
+            self.show(self.current)
+        self.current = previous
+
+    def hook(self, event: str, args: str = ""):
+        macros = sorted(
+            (
+                m
+                for m in self.macros.values()
+                if m.hook is not None and m.hook[0] == event
+            ),
+            key=lambda m: (-m.priority, not m.fallthrough, -m.number),
+        )
+        self.fire(macros, args)
+
+    def prompt(self, text: str):
+        self.hook("PROMPT", text)
+
+    def key(self, keys: str):
+        for macro in list(self.macros.values()):
+            if macro.bind == keys:
+                self.run(macro, Context(""))
+
+    def pythonCall(self, args: str):
+        (function, _, argument) = args.lstrip(" ").partition(" ")
+        (moduleName, _, functionName) = function.rpartition(".")
+        start = perf_counter()
+        try:
+            module = modules.get(moduleName) or import_module(moduleName)
+            getattr(module, functionName)(argument)
+        except Exception:
+            self.errors.append(format_exc())
+        seconds = perf_counter() - start
+        timing = self.timings.get(function, Timing(0, 0.0, 0.0))
+        self.timings[function] = Timing(
+            timing.calls + 1, timing.seconds + seconds, max(timing.maxSeconds, seconds)
+        )
+
+    def pythonLoad(self, args: str):
+        name = args.strip()
+        try:
+            if name in modules:
+                reload(modules[name])
+            else:
+                import_module(name)
+        except Exception:
+            self.errors.append(format_exc())
+
+    def trigger(self, args: str):
+        (_, text) = parseOptions(args)
+        self.line(text.lstrip(" "))
+
+    def substitute(self, args: str):
+        (_, text) = parseOptions(args)
+        self.current = ATTRIBUTE_RE.sub("", text.lstrip(" "))
+
+    def echo(self, args: str):
+        (_, text) = parseOptions(args)
+        self.show(ATTRIBUTE_RE.sub("", text.lstrip(" ")))
+
+
+BUILTINS: Dict[str, Callable[[TinyFugue, str], None]] = {
+    "def": TinyFugue.define,
+    "edit": TinyFugue.edit,
+    "undef": TinyFugue.undefine,
+    "python_call": TinyFugue.pythonCall,
+    "python_load": TinyFugue.pythonLoad,
+    "trigger": TinyFugue.trigger,
+    "substitute": TinyFugue.substitute,
+    "echo": TinyFugue.echo,
+}
+
+#: the installed instance
+TF: Optional[TinyFugue] = None
+
+
+def install(display: Optional[Callable[[str], None]] = None) -> TinyFugue:
+    """
+    Make this the tf module of the scripts imported after this, the same
+    instance is returned when already installed
+    """
+    global TF
+
+    if TF is None:
+        TF = TinyFugue(display)
+        TF.install()
+    return TF
@@ -0,0 +1,83 @@
+"""
+Feed a captured log through the tf scripts at full speed
+
+    python3 -m faketf.replay [--prompt PREFIX] [--show] LOG SCRIPT...
+
+LOG has one line from the mud per line, e.g. a TinyFugue /log of a bcproxy
+session. Lines starting with the prompt prefix are given to PROMPT hooks
+instead of triggers. SCRIPT is a module name like party, it is loaded with
+/python_load as in TinyFugue.
+
+Reports time per Python handler, the commands the scripts would have sent,
+errors from the handlers and commands that are not emulated.
+"""
+from argparse import ArgumentParser
+from sys import stderr, stdout
+from time import perf_counter
+
+import faketf
+
+
+def main():
+    parser = ArgumentParser(prog="python3 -m faketf.replay")
+    parser.add_argument("log")
+    parser.add_argument("scripts", nargs="+")
+    parser.add_argument("--prompt", default="PROMPT:", help="prompt line prefix")
+    parser.add_argument("--show", action="store_true", help="print shown lines")
+    args = parser.parse_args()
+
+    tf = faketf.install(print if args.show else None)
+    for script in args.scripts:
+        tf.eval("/python_load " + script)
+    for error in tf.errors:
+        print(error, file=stderr)
+    tf.resetStats()
+
+    lines = 0
+    start = perf_counter()
+    with open(args.log, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if line.startswith(args.prompt):
+                tf.prompt(line)
+            else:
+                tf.line(line)
+            lines += 1
+    seconds = perf_counter() - start
+
+    out = stdout
+    print(
+        "{0} lines in {1:.3f} s, {2:.0f} lines/s".format(
+            lines, seconds, lines / seconds if seconds > 0 else 0
+        ),
+        file=out,
+    )
+    print(
+        "{0:<40} {1:>8} {2:>10} {3:>10} {4:>10}".format(
+            "handler", "calls", "total ms", "mean us", "max us"
+        ),
+        file=out,
+    )
+    for (name, timing) in sorted(
+        tf.timings.items(), key=lambda item: item[1].seconds, reverse=True
+    ):
+        print(
+            "{0:<40} {1:>8} {2:>10.2f} {3:>10.2f} {4:>10.2f}".format(
+                name,
+                timing.calls,
+                timing.seconds * 1e3,
+                timing.seconds / timing.calls * 1e6,
+                timing.maxSeconds * 1e6,
+            ),
+            file=out,
+        )
+    print("{0} commands sent".format(len(tf.sent)), file=out)
+    for (name, count) in sorted(tf.unsupported.items()):
+        print("not emulated: /{0} {1} times".format(name, count), file=out)
+    if len(tf.errors) > 0:
+        print("{0} errors, first one:".format(len(tf.errors)), file=out)
+        print(tf.errors[0], file=out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 import dill  # type: ignore
-from multiprocessing.connection import Client
 from os import getuid
 from tf import eval as tfeval  # type: ignore
 from typing import (
@@ -12,26 +11,24 @@ from typing import (
     Sequence,
 )
 
+from sender import getSender
 from spells import DamType, getSpellByName, Spell
 from statustypes import Message, StatusType
 from tfutils import tfprint
 
 STATUS_SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-status".format(getuid())
+CONN = getSender(STATUS_SOCKET_FILE, encode=dill.dumps)
 
 
 def heartbeat(opts: str):
-    with Client(STATUS_SOCKET_FILE, "AF_UNIX") as conn:
-        msg = Message(StatusType.HEARTBEAT_RESET, None)
-        conn.send_bytes(dill.dumps(msg))
+    CONN.send(Message(StatusType.HEARTBEAT_RESET, None))
 
 
 def tick(spdiffRaw: str):
     try:
         spdiff = int(spdiffRaw)
         if spdiff > 120:
-            with Client(STATUS_SOCKET_FILE, "AF_UNIX") as conn:
-                msg = Message(StatusType.TICK_RESET, None)
-                conn.send_bytes(dill.dumps(msg))
+            CONN.send(Message(StatusType.TICK_RESET, None))
     except ValueError as e:
         None
 
@@ -1,27 +1,32 @@
+from atexit import register
+from bisect import bisect_left
 from enum import Enum
 from copy import deepcopy
 import dill  # type: ignore
-from multiprocessing.connection import Client
 from os import getuid
-import psycopg2  # type: ignore
-import psycopg2.extras  # type: ignore
+from os.path import expanduser, join
 from re import search, sub
 from time import time
 from tf import eval as tfeval  # type: ignore
 from typing import (
     Any,
+    Callable,
     Dict,
     List,
     Mapping,
     NamedTuple,
     Optional,
+    Sequence,
     Tuple,
 )
 
+from dbworker import DbWorker, Journal
+from mobinfostore import KillStats, Store, openStore
 from mobinfotypes import Monster
+from sender import Sender
 from spells import organizeSpells
 from tfutils import tfprint
-from utils import textdecode
+from utils import LruCache, textdecode
 
 
 class Auto(Enum):
@@ -43,15 +48,25 @@ class CurrentMobInfo(NamedTuple):
 
 class State(NamedTuple):
     conn: Any
-    sqlConnection: Any
-    sqlCursor: Any
+    db: Any
+    store: Optional[Store]
     room: Optional[str]
     area: Optional[str]
     areaId: Optional[int]
-    monsters: Mapping[str, Monster]
+    #: area whose monsters are being loaded from the database
+    loadingArea: Optional[str]
+    monsters: Dict[str, Monster]
+    #: names of monsters sorted, index + 1 is shown in monster info
+    monsterNames: List[str]
+    #: index of each name in monsterNames
+    monsterIndexes: Dict[str, int]
     aggroStatus: Dict[str, bool]
     newMonstersInThisRoom: List[str]
     monstersInThisRoom: List[str]
+    #: time each monster name was last seen in a room, recently seen only
+    lastSeen: LruCache[str, float]
+    #: kills of party kills output until its end, None for unknown monsters
+    pendingKills: List[Tuple[Optional[Monster], int]]
     currentMobInfo: Optional[CurrentMobInfo]
     isDeadShortname: Optional[str]
     isDeadTimestamp: Optional[float]
@@ -59,121 +74,30 @@ class State(NamedTuple):
     mobInfoCommands: List[str]
     areaHasRooms: bool
     auto: Auto
+    #: full loads of the monsters of an area in this session
+    areaLoads: int
+    #: monsters updated in the cache from the values written
+    cacheUpdates: int
+    #: area id and monsters of the recently visited areas by area name
+    areaCache: LruCache[str, Tuple[int, Dict[str, Monster]]]
 
 
 MOBINFO_SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-mobinfo".format(getuid())
 
+#: number of areas whose monsters are kept in memory
+AREA_CACHE_SIZE = 16
+#: areas visited longer ago than this are loaded again from the database
+AREA_CACHE_SECONDS = 30 * 60
+#: number of monster names whose time last seen is kept, for matching kills
+LAST_SEEN_SIZE = 256
+#: monsters seen longer ago than this are not preferred when matching kills
+LAST_SEEN_SECONDS = 30 * 60
+#: mobinfo database, a PostgreSQL connection string or a SQLite file ending
+#: with .sqlite to run without a database server
+MOBINFO_DATABASE = "dbname=batmud user=risto"
+#: writes made while the database is unavailable, replayed when it returns
+MOBINFO_JOURNAL_FILE = join(expanduser("~"), ".bcproxy-tf-scripts-mobinfo-journal")
 
-AREA_BY_NAME = """SELECT
-  a.id
-FROM
-  area as a
-  INNER JOIN areaname AS an ON a.id = an.area_id
-WHERE
-  an.name ILIKE %(area)s
-"""
-
-MONSTERS_BY_AREA = """SELECT
-  m.id,
-  m.name,
-  m.shortname,
-  m.race,
-  m.gender,
-  m.alignment,
-  m.aggro,
-  m.spells,
-  m.skills,
-  m.wikiexp,
-  count(k.id) as killcount,
-  ceil(percentile_disc(0.5) within group (order by k.exp) / 1000.0) as exp,
-  m.room_id,
-  m.area_id
-FROM
-  monster AS m
-  LEFT JOIN kill AS k ON k.monster_id = m.id
-WHERE
-  m.area_id = %(areaId)s
-GROUP BY
-  m.id
-"""
-
-MONSTER_ID_BY_NAME = """SELECT
-  id
-FROM
-  monster
-WHERE
-  (name ILIKE %(name)s OR name ILIKE %(nameUndead)s) AND room_id IS NULL
-"""
-
-MONSTER_INSERT = """INSERT INTO
-  monster (name, area_id, room_id, created)
-VALUES
-  (%(name)s, %(areaId)s, %(roomId)s, NOW())
-"""
-
-MONSTER_AREA_UPDATE = """UPDATE
-  monster
-SET
-  (name, area_id, room_id) = (%(name)s, %(areaId)s, %(roomId)s)
-WHERE
-  id = %(monsterId)s
-"""
-
-MONSTER_SHORTNAME_UPDATE = """UPDATE
-  monster
-SET
-  shortname = %(shortname)s
-WHERE
-  id = %(monsterId)s
-"""
-
-MONSTER_ALIGNMENT_UPDATE = """UPDATE
-  monster
-SET
-  alignment = %(alignment)s
-WHERE
-  id = %(monsterId)s
-"""
-
-MONSTER_MOBLOOK_UPDATE = """UPDATE
-  monster
-SET
-  (shortname, gender, race, description, eqs, aggro) = (%(shortname)s, %(gender)s, %(race)s, %(description)s, %(eqs)s, %(aggro)s)
-WHERE
-  id = %(monsterId)s
-"""
-
-KILL_SELECT = """SELECT
-  1
-FROM
-  kill
-WHERE
-  monster_id = %(monsterId)s
-  AND exp = %(exp)s
-  AND created >= NOW() - interval '1 day'
-"""
-
-KILL_INSERT = """INSERT INTO
-  kill (monster_id, exp, created)
-VALUES
-  (%(monsterId)s, %(exp)s, NOW())
-"""
-
-AREAID_INSERT = """INSERT INTO
-  area
-DEFAULT VALUES RETURNING id"""
-
-AREANAME_INSERT = """INSERT INTO
-  areaname (name, \"default\", wiki, batshoppe, area_id)
-VALUES
-  (%(area)s, 't', 'f', 'f', %(areaId)s)
-"""
-
-LEVEL_INSERT = """INSERT INTO
-  monsterlvl (monster_id, ownlvl, consider, created)
-VALUES
-  (%(monsterId)s, %(ownlvl)s, %(consider)s, NOW())
-"""
 
 state = State(
     None,
@@ -182,10 +106,15 @@ state = State(
     None,
     None,
     None,
+    None,
+    {},
+    [],
     {},
     {},
     [],
     [],
+    LruCache(LAST_SEEN_SIZE, LAST_SEEN_SECONDS),
+    [],
     None,
     None,
     None,
@@ -193,6 +122,9 @@ state = State(
     [],
     False,
     Auto.OFF,
+    0,
+    0,
+    LruCache(AREA_CACHE_SIZE, AREA_CACHE_SECONDS),
 )
 
 
@@ -213,42 +145,115 @@ def toggleAuto(s: str):
 
 
 def loadArea(area: str):
+    """
+    Load all the monsters of the area, only done when the area changes or
+    when asked with mobinfo_refresh, otherwise the cache is updated with
+    patchMonster
+    """
     global state
-    state.sqlCursor.execute(AREA_BY_NAME, {"area": area})
-    areaId = state.sqlCursor.fetchone()
-    if areaId is None:
-        tfprint("Adding new area {0}".format(area))
-        state.sqlCursor.execute(AREAID_INSERT)
-        newAreaId = state.sqlCursor.fetchone()
-        state.sqlCursor.execute(AREANAME_INSERT, {"areaId": newAreaId.id, "area": area})
-        state.sqlConnection.commit()
-        areaId = newAreaId
-
-    state.sqlCursor.execute(MONSTERS_BY_AREA, {"areaId": areaId.id})
-    monsters = {}
-    while True:
-        monster = state.sqlCursor.fetchone()
-        if monster is None:
-            break
-        monsters[monster.name] = Monster(
-            monster.id,
-            monster.name,
-            monster.shortname,
-            monster.race,
-            monster.gender,
-            monster.alignment,
-            monster.aggro,
-            monster.spells,
-            monster.skills,
-            monster.killcount,
-            monster.exp,
-            monster.wikiexp,
-            monster.room_id,
-            monster.area_id,
-        )
 
-    state = state._replace(areaId=areaId.id, monsters=monsters)
-    tfprint("Loaded {0} monsters for area {1}".format(len(monsters), area))
+    def loaded(result: Tuple[int, Dict[str, Monster], bool]):
+        global state
+        (areaId, monsters, isNew) = result
+        if state.loadingArea == area:
+            state = state._replace(loadingArea=None)
+        if state.area != area:
+            return
+        if isNew:
+            tfprint("Adding new area {0}".format(area))
+        areaChanged = state.areaId is None
+        state = state._replace(areaId=areaId, monsters=monsters)
+        indexMonsters()
+        state.areaCache.put(area, (areaId, monsters))
+        # reports of the monsters are then cache lookups
+        for monster in monsters.values():
+            if monster.spells:
+                organizeSpells(monster.spells)
+        tfprint("Loaded {0} monsters for area {1}".format(len(monsters), area))
+        if areaChanged and len(state.monstersInThisRoom) > 0:
+            updateMonsters()
+
+    def failed(e: BaseException):
+        global state
+        # the next room loads the area again
+        if state.loadingArea == area:
+            state = state._replace(loadingArea=None)
+
+    state = state._replace(areaLoads=state.areaLoads + 1, loadingArea=area)
+    store = state.store
+    state.db.call(
+        lambda cursor: store.queryArea(cursor, area), loaded, errback=failed
+    )
+
+
+def write(
+    fn: Callable[..., Any],
+    *args,
+    callback: Optional[Callable[[Any], None]] = None,
+) -> bool:
+    """
+    Enqueue a write, fn is a method of the store called with a cursor and args
+
+    :returns: False if the database is unavailable and the write was journaled
+    """
+    return state.db.call(
+        lambda cursor: fn(cursor, *args), callback, (fn.__name__, args)
+    )
+
+
+def applyJournaled(cursor, op: str, args: Sequence[Any]):
+    getattr(state.store, op)(cursor, *args)
+
+
+def patchMonster(monsterId: int, name: str, **changes):
+    """
+    Update a monster in the cache with the values just written to database
+
+    The area may have changed before a callback, so the monster is looked up
+    by id in the cached areas too, a monster of the same name in another
+    area is a different monster.
+    """
+    global state
+    patched = False
+    areas = [state.monsters] + [
+        monsters for (_, (_, monsters)) in state.areaCache.items()
+    ]
+    for monsters in areas:
+        monster = monsters.get(name)
+        if monster is not None and monster.id == monsterId:
+            monsters[name] = monster._replace(**changes)
+            patched = True
+    if patched:
+        state = state._replace(cacheUpdates=state.cacheUpdates + 1)
+
+
+def refresh(s: str):
+    if state.area is not None:
+        state.areaCache.invalidate(state.area)
+        loadArea(state.area)
+
+
+def rebuildStats(s: str):
+    """
+    Compute monster_stats again from all the kills
+    """
+
+    def rebuilt(_):
+        tfprint("Monster stats rebuilt")
+        refresh("")
+
+    state.db.call(state.store.rebuildStats, rebuilt)
+
+
+def printStats(s: str):
+    tfprint(
+        "{0} area loads, {1} cache updates, area cache {2} hits, {3} misses".format(
+            state.areaLoads,
+            state.cacheUpdates,
+            state.areaCache.hits,
+            state.areaCache.misses,
+        )
+    )
 
 
 def parseName(rawName: str) -> str:
@@ -283,6 +288,7 @@ def addMonsterToRoom(rawName: str):
     ):
         # tfprint("adding {0}".format(name))
         state.newMonstersInThisRoom.append(name)
+        state.lastSeen.put(name, time())
     else:
         tfprint("ignoring {0}".format(name))
 
@@ -299,10 +305,22 @@ def setMonsterUnaggro(rawName: str):
     state.aggroStatus[name] = False
 
 
+def indexMonsters():
+    """
+    Sort the monster names again after the names in monsters have changed
+    """
+    global state
+    names = sorted(state.monsters.keys())
+    state = state._replace(
+        monsterNames=names, monsterIndexes={name: i for (i, name) in enumerate(names)}
+    )
+
+
 def monsterIndex(name: str) -> Optional[Tuple[int, Monster]]:
     global state
-    if name in state.monsters:
-        return (sorted(state.monsters.keys()).index(name), state.monsters[name])
+    i = state.monsterIndexes.get(name)
+    if i is not None:
+        return (i, state.monsters[name])
     else:
         return None
 
@@ -310,11 +328,57 @@ def monsterIndex(name: str) -> Optional[Tuple[int, Monster]]:
 def monsterFromIndex(i: int) -> Optional[Monster]:
     global state
     try:
-        return state.monsters[sorted(state.monsters.keys())[i - 1]]
+        return state.monsters[state.monsterNames[i - 1]]
     except:
         return None
 
 
+def monsterCandidates(prefix: str) -> List[str]:
+    """
+    Names of the monsters of the area starting with prefix
+    """
+    global state
+    names = state.monsterNames
+    candidates = []
+    i = bisect_left(names, prefix)
+    while i < len(names) and names[i].startswith(prefix):
+        candidates.append(names[i])
+        i += 1
+    return candidates
+
+
+def matchKillName(name: str) -> Optional[str]:
+    """
+    Find the monster of a kill line, long names in party kills are shortened
+
+    A monster in this room wins, then the most recently seen one, then one
+    with exactly this name.
+    """
+    global state
+    candidates = monsterCandidates(name)
+    if len(candidates) <= 1:
+        return candidates[0] if len(candidates) == 1 else None
+
+    inRoom = [c for c in candidates if c in state.monstersInThisRoom]
+    if len(inRoom) > 0:
+        return inRoom[0]
+    seen = []
+    for c in candidates:
+        seenAt = state.lastSeen.get(c)
+        if seenAt is not None:
+            seen.append((seenAt, c))
+    if len(seen) > 0:
+        return max(seen)[1]
+    if name in state.monsters:
+        return name
+    tfprint(
+        "Kill {0} matches {1} monsters, using {2}".format(
+            name, len(candidates), candidates[0]
+        )
+    )
+    return candidates[0]
+
+
 def monsterInfo():
     global state
 
@@ -323,7 +387,7 @@ def monsterInfo():
     for name in state.monstersInThisRoom:
         indexAndMonster = monsterIndex(name)
         if indexAndMonster is not None:
-            state.conn.send_bytes(dill.dumps(indexAndMonster))
+            state.conn.send(indexAndMonster)
             if name in state.monsters and state.monsters[name].shortname is not None:
                 shortnames.append(state.monsters[name].shortname)
     if state.auto is not Auto.OFF:
@@ -357,63 +421,97 @@ def doMoblook(s: str):
         moblook("{0} {1}".format(index + 1, monster.shortname))
 
 
-def updateMonster(id: int, name: str):
-    global state
-    if state.areaId is not None and state.area is not None:
-        tfprint(
-            "Updating monster {0} {1} to area {2} {3}".format(
-                id, name, state.areaId, state.area
+def resolveMonsters(
+    store: Store,
+    cursor,
+    ids: Mapping[str, Optional[int]],
+    area: str,
+    areaId: int,
+    room: Optional[str],
+) -> Tuple[Dict[str, Monster], List[str]]:
+    """
+    Run in the database worker: move the monsters seen in the room to this
+    area or add them
+
+    :param ids: monster ids by name, None if not known yet
+    :returns: the moved and added monsters and messages to be printed
+    """
+    resolved = {}
+    messages = []
+    for (name, id) in ids.items():
+        if id is None:
+            id = store.monsterIdByName(cursor, name)
+
+        if id is None:
+            messages.append(
+                "Adding monster {0} to area {1} {2}".format(name, areaId, area)
             )
-        )
-        state.sqlCursor.execute(
-            MONSTER_AREA_UPDATE,
-            {
-                "areaId": state.areaId,
-                "monsterId": id,
-                "name": name,
-                "roomId": state.room,
-            },
-        )
-        state.sqlConnection.commit()
-        loadArea(state.area)
-
+            resolved[name] = Monster(
+                store.insertMonster(cursor, name, areaId, room),
+                name,
+                None,
+                None,
+                None,
+                None,
+                None,
+                frozenset(),
+                frozenset(),
+                0,
+                None,
+                None,
+                room,
+                areaId,
+            )
+        else:
+            messages.append(
+                "Updating monster {0} {1} to area {2} {3}".format(
+                    id, name, areaId, area
+                )
+            )
+            resolved[name] = store.moveMonster(cursor, id, name, areaId, room)
 
-def insertMonster(name: str):
-    global state
-    if state.areaId is not None and state.area is not None:
-        tfprint(
-            "Adding monster {0} to area {1} {2}".format(name, state.areaId, state.area)
-        )
-        state.sqlCursor.execute(
-            MONSTER_INSERT,
-            {
-                "areaId": state.areaId,
-                "name": name,
-                "roomId": state.room,
-            },
-        )
-        state.sqlConnection.commit()
-        loadArea(state.area)
+    return (resolved, messages)
 
 
 def updateMonsters():
+    """
+    Add the monsters of this room not yet in this area to the database,
+    monster info is sent after that
+    """
     global state
-    ms = deepcopy(state.monstersInThisRoom)
-    while len(ms) > 0 and state.area is not None:
-        name = ms.pop()
-        if name in state.monsters:
-            m = state.monsters[name]
-            if m.areaId is None:
-                updateMonster(m.id, m.name)
-        else:
-            state.sqlCursor.execute(
-                MONSTER_ID_BY_NAME, {"name": name, "nameUndead": name + " (undead)"}
-            )
-            monsterId = state.sqlCursor.fetchone()
-            if monsterId is not None:
-                updateMonster(monsterId.id, name)
-            else:
-                insertMonster(name)
+    ids = {
+        name: state.monsters[name].id if name in state.monsters else None
+        for name in state.monstersInThisRoom
+        if name not in state.monsters or state.monsters[name].areaId is None
+    }
+    if state.area is None or state.areaId is None or len(ids) == 0:
+        monsterInfo()
+        return
+
+    store = state.store
+    area = state.area
+    areaId = state.areaId
+    room = state.room
+
+    def resolved(result: Tuple[Dict[str, Monster], List[str]]):
+        global state
+        (monsters, messages) = result
+        for message in messages:
+            tfprint(message)
+        # monsters moved from other areas are still in their cached areas
+        for (cachedArea, (_, cachedMonsters)) in state.areaCache.items():
+            if cachedArea != area and any(name in cachedMonsters for name in monsters):
+                state.areaCache.invalidate(cachedArea)
+        if state.areaId == areaId:
+            state.monsters.update(monsters)
+            indexMonsters()
+            state = state._replace(cacheUpdates=state.cacheUpdates + len(monsters))
+            monsterInfo()
+
+    state.db.call(
+        lambda cursor: resolveMonsters(store, cursor, ids, area, areaId, room),
+        resolved,
+    )
 
 
 def whereami(s: str):
@@ -422,8 +520,16 @@ def whereami(s: str):
     if state.area != area and area[-13:] != "(player city)" and area[-6:] != "(ship)":
         tfprint("Area changed to {0}".format(area))
         state.monstersInThisRoom.clear()
-        state = state._replace(area=area)
-        loadArea(area)
+        cached = state.areaCache.get(area)
+        if cached is not None:
+            (areaId, monsters) = cached
+            state = state._replace(area=area, areaId=areaId, monsters=monsters)
+            indexMonsters()
+            tfprint("Cached {0} monsters for area {1}".format(len(monsters), area))
+        else:
+            state = state._replace(area=area, areaId=None, monsters={})
+            indexMonsters()
+            loadArea(area)
     else:
         state.monstersInThisRoom.clear()
 
@@ -442,6 +548,7 @@ def room(s: str):
     if area[-13:] == "(player city)" or area[-6:] == "(ship)":
         state.monstersInThisRoom.clear()
         state = state._replace(room=room, area=None, areaId=None, monsters={})
+        indexMonsters()
         return
     elif state.area != area:
         state.monstersInThisRoom.clear()
@@ -452,6 +559,7 @@ def room(s: str):
 
 def prompt(s: str):
     global state
+    state.db.runCallbacks()
     if state.areaHasRooms == False and len(state.newMonstersInThisRoom) > 0:
         roomDone()
 
@@ -465,13 +573,17 @@ def roomDone():
     state = state._replace(
         monstersInThisRoom=state.newMonstersInThisRoom, newMonstersInThisRoom=[]
     )
+    if state.area is not None and state.areaId is None:
+        # area is being loaded, monsters are updated after that
+        if state.loadingArea != state.area:
+            loadArea(state.area)
+        return
     updateMonsters()
-    monsterInfo()
 
 
 def printState(s: str):
     global state
-    tfprint(str(state._replace(monsters={})))
+    tfprint(str(state._replace(monsters={}, monsterNames=[], monsterIndexes={})))
 
 
 def isDead(shortname: str):
@@ -485,17 +597,64 @@ def isDead(shortname: str):
 
 
 def pkillsStart(s: str):
+    if len(state.pendingKills) > 0:
+        insertKills()
     cmds = [
         "/def -agGL -mregexp -t`^\\\| [0-9]{1,2}:[0-9]{2}\\\s+[0-9]+: .+\\\|\$` "
         + "party_kills_line = /python_call mobinfo.updateExp \%*",
         "/def -agGL -mregexp -n1 -t`^This party has killed \\\d+ monsters? \\\(avg exp/mon: \\\d+\\\)\\\.\$` "
-        + "party_kills_end = /undef party_kills_line",
+        + "party_kills_end = /undef party_kills_line\%; /python_call mobinfo.pkillsEnd",
         "@party kills 1",
     ]
     for cmd in cmds:
         tfeval(cmd)
 
 
+def pkillsEnd(s: str):
+    if len(state.pendingKills) > 0:
+        insertKills()
+
+
+def insertKills():
+    """
+    Insert the kills buffered from party kills output in one statement
+
+    Kills of monsters not in the monsters of the area are not stored, e.g.
+    all of them while the database is down and no area has been loaded.
+    """
+    global state
+    kills = state.pendingKills
+    state = state._replace(pendingKills=[])
+    known = [(monster, exp) for (monster, exp) in kills if monster is not None]
+    monsterNames = {monster.id: monster.name for (monster, _) in known}
+    values = [(monster.id, exp) for (monster, exp) in known]
+    unknown = len(kills) - len(known)
+
+    if len(values) == 0:
+        tfprint(
+            "Party kills: {0} kills of unknown monsters discarded".format(unknown)
+        )
+        return
+
+    def inserted(result: Tuple[int, List[KillStats]]):
+        (added, stats) = result
+        for (monsterId, killcount, exp) in stats:
+            patchMonster(
+                monsterId, monsterNames[monsterId], killcount=killcount, exp=exp
+            )
+        tfprint(
+            "Party kills: {0} kills, {1} added, {2} unknown monsters".format(
+                len(kills), added, unknown
+            )
+        )
+
+    if not write(state.store.insertKills, values, callback=inserted):
+        tfprint(
+            "Party kills: {0} kills journaled, {1} kills of unknown monsters "
+            "discarded".format(len(values), unknown)
+        )
+
+
 def updateExp(s: str):
     global state
     s = s.strip("| ")
@@ -505,34 +664,21 @@ def updateExp(s: str):
     try:
         exp = int(parts[0])
         name = parts[1]
-        # long names in p kills are shortened
-        match = next(
-            (match for match in state.monsters if match.startswith(name)), None
-        )
-        if match is not None:
+        match = matchKillName(name)
+        if match is None:
+            state.pendingKills.append((None, exp))
+        else:
             monster = state.monsters[match]
-            state.sqlCursor.execute(KILL_SELECT, {"monsterId": monster.id, "exp": exp})
-            killExists = state.sqlCursor.fetchone()
-            if killExists is None:
-                state.sqlCursor.execute(
-                    KILL_INSERT, {"monsterId": monster.id, "exp": exp}
-                )
-                state.sqlConnection.commit()
-                tfprint(
-                    "Kill added: {0} {1}, {2} exp".format(monster.id, monster.name, exp)
-                )
+            state.pendingKills.append((monster, exp))
             if monster.shortname is None and state.isDeadShortname is not None:
                 tfprint(
                     "Updating monster {0} {1} shortname to {2}".format(
                         monster.id, name, state.isDeadShortname
                     )
                 )
-                state.sqlCursor.execute(
-                    MONSTER_SHORTNAME_UPDATE,
-                    {"monsterId": monster.id, "shortname": state.isDeadShortname},
-                )
+                write(state.store.updateShortname, monster.id, state.isDeadShortname)
+                patchMonster(monster.id, monster.name, shortname=state.isDeadShortname)
                 state = state._replace(isDeadShortname=None, isDeadTimestamp=None)
-                state.sqlConnection.commit()
     except (ValueError, IndexError):
         # tf.err("error parsing kill line")
         return 1
@@ -719,21 +865,19 @@ def moblookEnd(s: str):
                     id, name, shortname, gender, race, aggro
                 )
             )
-            state.sqlCursor.execute(
-                MONSTER_MOBLOOK_UPDATE,
-                {
-                    "monsterId": id,
-                    "shortname": shortname,
-                    "gender": gender,
-                    "race": race,
-                    "description": description,
-                    "eqs": eqs,
-                    "aggro": aggro,
-                },
+            write(
+                state.store.updateMoblook,
+                id,
+                shortname,
+                gender,
+                race,
+                description,
+                eqs,
+                aggro,
+            )
+            patchMonster(
+                id, name, shortname=shortname, gender=gender, race=race, aggro=aggro
             )
-            state.sqlConnection.commit()
-            if state.area:
-                loadArea(state.area)
 
             doNextMoblookCmd()
 
@@ -758,13 +902,8 @@ def align(s: str):
         if monster is not None:
             id = monster.id
             tfprint("Updating monster {0} {1}: ({2})".format(id, monster.name, align))
-            state.sqlCursor.execute(
-                MONSTER_ALIGNMENT_UPDATE,
-                {"monsterId": id, "alignment": align},
-            )
-            state.sqlConnection.commit()
-            if state.area:
-                loadArea(state.area)
+            write(state.store.updateAlignment, id, align)
+            patchMonster(id, monster.name, align=align)
             doNextMoblookCmd()
 
 
@@ -808,10 +947,7 @@ def level(s: str):
                     id, monster.name, ownlvl, consider
                 )
             )
-            state.sqlCursor.execute(
-                LEVEL_INSERT, {"monsterId": id, "consider": consider, "ownlvl": ownlvl}
-            )
-            state.sqlConnection.commit()
+            write(state.store.insertLevel, id, ownlvl, consider, time())
             doNextMoblookCmd()
 
 
@@ -831,10 +967,19 @@ def parseMobInfoCommands(s: str):
 def setup():
     global state
 
-    conn = Client(MOBINFO_SOCKET_FILE, "AF_UNIX")
-    sqlConnection = psycopg2.connect("dbname=batmud user=risto")
-    sqlCursor = sqlConnection.cursor(cursor_factory=psycopg2.extras.NamedTupleCursor)
-    state = state._replace(conn=conn, sqlConnection=sqlConnection, sqlCursor=sqlCursor)
+    conn = Sender(MOBINFO_SOCKET_FILE, encode=dill.dumps)
+    store = openStore(MOBINFO_DATABASE)
+    journal = Journal(
+        MOBINFO_JOURNAL_FILE, applyJournaled, bulkOps=frozenset(["insertKills"])
+    )
+    db = DbWorker(
+        store.connect,
+        connectionErrors=store.connectionErrors,
+        onConnect=store.createSchema,
+        journal=journal,
+    )
+    register(db.flush)
+    state = state._replace(conn=conn, db=db, store=store)
 
     cmds: Sequence[str] = [
         "/def -p10 -mglob -t`∴room *` "
@@ -904,6 +1049,9 @@ def setup():
         + "^'mobinfo_commands' is an command-alias to '(.+)'\\\.\$`"
         + " mobinfo_commands = /python_call mobinfo.parseMobInfoCommands \%P1",
         "/def -p10 -mglob -t`Exited to map from *` " + "mobinfo_area_exit = @whereami",
+        "/def mobinfo_refresh = /python_call mobinfo.refresh",
+        "/def mobinfo_stats = /python_call mobinfo.printStats",
+        "/def mobinfo_rebuild_stats = /python_call mobinfo.rebuildStats",
     ]
     # this command is too difficult to get through tfeval as string
     tfeval("/load ~/bat/bcproxy-tf-scripts/mobinfo.tf")
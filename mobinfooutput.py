@@ -1,10 +1,10 @@
 from collections import deque  # type: ignore
 import dill  # type: ignore
-from multiprocessing.connection import Listener
 from os import getuid
 from threading import Timer
 from typing import cast, Tuple
 
+from outputserver import Connection, listen, Pane
 from utils import Color, colorize, GREEN, RED, YELLOW, WHITE
 
 MOBINFO_SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-mobinfo".format(getuid())
@@ -24,7 +24,10 @@ def receiveMessage(msg: Tuple[int, Monster]):
             # or monster.align is None
         ):
             mobnameColor = Color(0xFF, 0xFF, 0xA0)
-        print(colorize("{0} {1}".format(index + 1, monster.name[:35]), mobnameColor))
+        print(
+            colorize("{0} {1}".format(index + 1, monster.name[:35]), mobnameColor),
+            file=PANE.out,
+        )
 
         exp = "?"
         if monster.exp is not None:
@@ -45,30 +48,32 @@ def receiveMessage(msg: Tuple[int, Monster]):
                 monster.race,
                 monster.gender,
                 monster.align,
-            )
+            ),
+            file=PANE.out,
         )
         spells = list(monster.spells) if monster.spells is not None else []
         skills = list(monster.skills) if monster.skills is not None else []
         spellsskills = spells + skills
 
         if len(spellsskills) > 0:
-            print("   " + ", ".join(spellsskills))
+            print("   " + ", ".join(spellsskills), file=PANE.out)
         state = state._replace(latestMonster=monster)
 
 
-state = State(None)
+class MobinfoPane(Pane):
+    def connected(self, conn: Connection):
+        self.log("connection {0} opened".format(conn.number))
+
+    def received(self, conn: Connection, data: bytes):
+        receiveMessage(cast(Tuple[int, Monster], dill.loads(data)))
 
-with Listener(MOBINFO_SOCKET_FILE, "AF_UNIX") as listener:
-    print("listening to connections on {0}".format(MOBINFO_SOCKET_FILE))
+    def closed(self, conn: Connection):
+        self.log("connection {0} closed".format(conn.number))
+
+
+state = State(None)
 
-    while True:
-        with listener.accept() as conn:
-            print("connection opened", listener.last_accepted)
+PANE = MobinfoPane(MOBINFO_SOCKET_FILE)
 
-            while True:
-                try:
-                    msg = cast(Tuple[int, Monster], dill.loads(conn.recv_bytes()))
-                    receiveMessage(msg)
-                except EOFError:
-                    print("connection closed")
-                    break
+if __name__ == "__main__":
+    listen(PANE)
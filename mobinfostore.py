@@ -0,0 +1,849 @@
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from functools import lru_cache
+from json import loads
+from math import ceil
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from mobinfotypes import Monster
+
+#: monster id, kill count and median exp in thousands of a monster
+KillStats = Tuple[int, int, Optional[float]]
+
+
+class Store(ABC):
+    """
+    Areas, monsters, kills and levels of mobinfo in a database
+
+    The methods are run in the database worker with a cursor of a connection
+    from connect(), the worker commits. Subclasses give the SQL of their
+    database in the class attributes, with named parameters.
+    """
+
+    #: errors after which the connection is opened again
+    connectionErrors: Tuple[Type[BaseException], ...] = (OSError,)
+
+    AREA_BY_NAME = ""
+    AREA_INSERT = ""
+    AREANAME_INSERT = ""
+    MONSTERS_BY_AREA = ""
+    MONSTER_BY_ID = ""
+    MONSTER_ID_BY_NAME = ""
+    MONSTER_INSERT = ""
+    MONSTER_AREA_UPDATE = ""
+    MONSTER_SHORTNAME_UPDATE = ""
+    MONSTER_ALIGNMENT_UPDATE = ""
+    MONSTER_MOBLOOK_UPDATE = ""
+    LEVEL_INSERT = ""
+
+    # kills stored before monster_stats existed have no stats yet
+    STATS_MISSING = """SELECT
+  1
+FROM
+  kill
+WHERE
+  NOT EXISTS (
+    SELECT
+      1
+    FROM
+      monster_stats
+  )
+LIMIT
+  1
+"""
+
+    @abstractmethod
+    def connect(self) -> Any:
+        pass
+
+    @abstractmethod
+    def createSchema(self, cursor):
+        """
+        Create the tables and indexes that are missing, and the stats of the
+        kills if monster_stats is new
+        """
+        pass
+
+    @abstractmethod
+    def insertKills(
+        self, cursor, kills: Sequence[Tuple[int, int]]
+    ) -> Tuple[int, List[KillStats]]:
+        """
+        Insert kills not already stored within the last day and update the
+        stats of their monsters
+
+        :param kills: monster id and exp of each kill
+        :returns: number of kills inserted and the new stats of the monsters
+                  with added kills
+        """
+        pass
+
+    @abstractmethod
+    def rebuildStats(self, cursor):
+        """
+        Compute the stats of all monsters again from their kills
+        """
+        pass
+
+    def fillStats(self, cursor):
+        """
+        Rebuild the stats if monster_stats is empty but there are kills, run
+        at the end of createSchema
+        """
+        cursor.execute(self.STATS_MISSING)
+        if cursor.fetchone() is not None:
+            self.rebuildStats(cursor)
+
+    def toMonster(self, row) -> Monster:
+        return Monster(
+            row.id,
+            row.name,
+            row.shortname,
+            row.race,
+            row.gender,
+            row.alignment,
+            row.aggro,
+            row.spells,
+            row.skills,
+            row.killcount,
+            row.exp,
+            row.wikiexp,
+            row.room_id,
+            row.area_id,
+        )
+
+    def queryMonsters(self, cursor, areaId: int) -> Dict[str, Monster]:
+        cursor.execute(self.MONSTERS_BY_AREA, {"areaId": areaId})
+        return {row.name: self.toMonster(row) for row in cursor.fetchall()}
+
+    def queryArea(self, cursor, area: str) -> Tuple[int, Dict[str, Monster], bool]:
+        """
+        :returns: area id, monsters of the area and whether the area is new
+        """
+        cursor.execute(self.AREA_BY_NAME, {"area": area})
+        areaId = cursor.fetchone()
+        isNew = areaId is None
+        if areaId is None:
+            cursor.execute(self.AREA_INSERT)
+            areaId = cursor.fetchone()
+            cursor.execute(self.AREANAME_INSERT, {"areaId": areaId.id, "area": area})
+
+        return (areaId.id, self.queryMonsters(cursor, areaId.id), isNew)
+
+    def monsterIdByName(self, cursor, name: str) -> Optional[int]:
+        """
+        Id of a monster not seen in any room yet
+        """
+        cursor.execute(
+            self.MONSTER_ID_BY_NAME, {"name": name, "nameUndead": name + " (undead)"}
+        )
+        monsterId = cursor.fetchone()
+        return monsterId.id if monsterId is not None else None
+
+    def insertMonster(
+        self, cursor, name: str, areaId: int, room: Optional[str]
+    ) -> int:
+        cursor.execute(
+            self.MONSTER_INSERT, {"areaId": areaId, "name": name, "roomId": room}
+        )
+        return cursor.fetchone().id
+
+    def moveMonster(
+        self, cursor, monsterId: int, name: str, areaId: int, room: Optional[str]
+    ) -> Monster:
+        cursor.execute(
+            self.MONSTER_AREA_UPDATE,
+            {"areaId": areaId, "monsterId": monsterId, "name": name, "roomId": room},
+        )
+        cursor.execute(self.MONSTER_BY_ID, {"monsterId": monsterId})
+        return self.toMonster(cursor.fetchone())
+
+    def updateShortname(self, cursor, monsterId: int, shortname: str):
+        cursor.execute(
+            self.MONSTER_SHORTNAME_UPDATE,
+            {"monsterId": monsterId, "shortname": shortname},
+        )
+
+    def updateAlignment(self, cursor, monsterId: int, alignment: str):
+        cursor.execute(
+            self.MONSTER_ALIGNMENT_UPDATE,
+            {"monsterId": monsterId, "alignment": alignment},
+        )
+
+    def updateMoblook(
+        self,
+        cursor,
+        monsterId: int,
+        shortname: Optional[str],
+        gender: Optional[str],
+        race: Optional[str],
+        description: Optional[str],
+        eqs: Optional[str],
+        aggro: Optional[bool],
+    ):
+        cursor.execute(
+            self.MONSTER_MOBLOOK_UPDATE,
+            {
+                "monsterId": monsterId,
+                "shortname": shortname,
+                "gender": gender,
+                "race": race,
+                "description": description,
+                "eqs": eqs,
+                "aggro": aggro,
+            },
+        )
+
+    def insertLevel(
+        self,
+        cursor,
+        monsterId: int,
+        ownlvl: Optional[int],
+        consider: str,
+        created: float,
+    ):
+        """
+        :param created: time of the consider, the level is inserted only once
+                        for it when replayed from the journal
+        """
+        cursor.execute(
+            self.LEVEL_INSERT,
+            {
+                "monsterId": monsterId,
+                "consider": consider,
+                "ownlvl": ownlvl,
+                "created": created,
+            },
+        )
+
+
+class PostgresStore(Store):
+    """
+    The mobinfo database in PostgreSQL, needs psycopg2
+    """
+
+    AREA_BY_NAME = """SELECT
+  a.id
+FROM
+  area as a
+  INNER JOIN areaname AS an ON a.id = an.area_id
+WHERE
+  an.name ILIKE %(area)s
+"""
+
+    AREA_INSERT = """INSERT INTO
+  area
+DEFAULT VALUES RETURNING id"""
+
+    AREANAME_INSERT = """INSERT INTO
+  areaname (name, \"default\", wiki, batshoppe, area_id)
+VALUES
+  (%(area)s, 't', 'f', 'f', %(areaId)s)
+"""
+
+    MONSTERS_BY_AREA = """SELECT
+  m.id,
+  m.name,
+  m.shortname,
+  m.race,
+  m.gender,
+  m.alignment,
+  m.aggro,
+  m.spells,
+  m.skills,
+  m.wikiexp,
+  coalesce(s.killcount, 0) as killcount,
+  ceil(s.median_exp / 1000.0) as exp,
+  m.room_id,
+  m.area_id
+FROM
+  monster AS m
+  LEFT JOIN monster_stats AS s ON s.monster_id = m.id
+WHERE
+  m.area_id = %(areaId)s
+"""
+
+    MONSTER_BY_ID = """SELECT
+  m.id,
+  m.name,
+  m.shortname,
+  m.race,
+  m.gender,
+  m.alignment,
+  m.aggro,
+  m.spells,
+  m.skills,
+  m.wikiexp,
+  coalesce(s.killcount, 0) as killcount,
+  ceil(s.median_exp / 1000.0) as exp,
+  m.room_id,
+  m.area_id
+FROM
+  monster AS m
+  LEFT JOIN monster_stats AS s ON s.monster_id = m.id
+WHERE
+  m.id = %(monsterId)s
+"""
+
+    MONSTER_ID_BY_NAME = """SELECT
+  id
+FROM
+  monster
+WHERE
+  (name ILIKE %(name)s OR name ILIKE %(nameUndead)s) AND room_id IS NULL
+"""
+
+    MONSTER_INSERT = """INSERT INTO
+  monster (name, area_id, room_id, created)
+VALUES
+  (%(name)s, %(areaId)s, %(roomId)s, NOW())
+RETURNING id
+"""
+
+    MONSTER_AREA_UPDATE = """UPDATE
+  monster
+SET
+  (name, area_id, room_id) = (%(name)s, %(areaId)s, %(roomId)s)
+WHERE
+  id = %(monsterId)s
+"""
+
+    MONSTER_SHORTNAME_UPDATE = """UPDATE
+  monster
+SET
+  shortname = %(shortname)s
+WHERE
+  id = %(monsterId)s
+"""
+
+    MONSTER_ALIGNMENT_UPDATE = """UPDATE
+  monster
+SET
+  alignment = %(alignment)s
+WHERE
+  id = %(monsterId)s
+"""
+
+    MONSTER_MOBLOOK_UPDATE = """UPDATE
+  monster
+SET
+  (shortname, gender, race, description, eqs, aggro) = (%(shortname)s, %(gender)s, %(race)s, %(description)s, %(eqs)s, %(aggro)s)
+WHERE
+  id = %(monsterId)s
+"""
+
+    LEVEL_INSERT = """INSERT INTO
+  monsterlvl (monster_id, ownlvl, consider, created)
+SELECT
+  %(monsterId)s,
+  %(ownlvl)s,
+  %(consider)s,
+  to_timestamp(%(created)s)
+WHERE
+  NOT EXISTS (
+    SELECT
+      1
+    FROM
+      monsterlvl
+    WHERE
+      monster_id = %(monsterId)s
+      AND created = to_timestamp(%(created)s)
+  )
+"""
+
+    # kills of the last day are listed again by party kills, only new ones
+    # are inserted
+    KILLS_INSERT = """INSERT INTO
+  kill (monster_id, exp, created)
+SELECT DISTINCT
+  v.monster_id,
+  v.exp,
+  NOW()
+FROM
+  (VALUES %s) AS v (monster_id, exp)
+WHERE
+  NOT EXISTS (
+    SELECT
+      1
+    FROM
+      kill AS k
+    WHERE
+      k.monster_id = v.monster_id
+      AND k.exp = v.exp
+      AND k.created >= NOW() - interval '1 day'
+  )
+RETURNING monster_id
+"""
+
+    # exp statistics of monsters from their kills, kept in monster_stats so
+    # that loading an area doesn't go through the whole kill table
+    MONSTER_STATS_SELECT = """SELECT
+  monster_id,
+  count(*),
+  percentile_disc(0.5) within group (order by exp),
+  avg(exp),
+  min(exp),
+  max(exp),
+  max(created)
+FROM
+  kill
+"""
+
+    MONSTER_STATS_UPSERT = """INSERT INTO
+  monster_stats (monster_id, killcount, median_exp, mean_exp, min_exp, max_exp, last_kill)
+{0}
+WHERE
+  monster_id = ANY(%(monsterIds)s)
+GROUP BY
+  monster_id
+ON CONFLICT (monster_id) DO UPDATE SET
+  (killcount, median_exp, mean_exp, min_exp, max_exp, last_kill) = (
+    EXCLUDED.killcount, EXCLUDED.median_exp, EXCLUDED.mean_exp,
+    EXCLUDED.min_exp, EXCLUDED.max_exp, EXCLUDED.last_kill
+  )
+RETURNING monster_id, killcount, ceil(median_exp / 1000.0) as exp
+""".format(MONSTER_STATS_SELECT)
+
+    MONSTER_STATS_REBUILD = """DELETE FROM monster_stats;
+INSERT INTO
+  monster_stats (monster_id, killcount, median_exp, mean_exp, min_exp, max_exp, last_kill)
+{0}
+GROUP BY
+  monster_id
+""".format(MONSTER_STATS_SELECT)
+
+    SCHEMA = """CREATE TABLE IF NOT EXISTS area (
+  id serial PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS areaname (
+  name text NOT NULL,
+  "default" boolean NOT NULL,
+  wiki boolean NOT NULL,
+  batshoppe boolean NOT NULL,
+  area_id integer NOT NULL REFERENCES area (id)
+);
+CREATE TABLE IF NOT EXISTS monster (
+  id serial PRIMARY KEY,
+  name text NOT NULL,
+  shortname text,
+  race text,
+  gender text,
+  alignment text,
+  aggro boolean,
+  spells text[],
+  skills text[],
+  wikiexp text,
+  description text,
+  eqs text,
+  room_id text,
+  area_id integer REFERENCES area (id),
+  created timestamp NOT NULL
+);
+CREATE TABLE IF NOT EXISTS kill (
+  id serial PRIMARY KEY,
+  monster_id integer NOT NULL REFERENCES monster (id),
+  exp integer NOT NULL,
+  created timestamp NOT NULL
+);
+CREATE TABLE IF NOT EXISTS monsterlvl (
+  id serial PRIMARY KEY,
+  monster_id integer NOT NULL REFERENCES monster (id),
+  ownlvl integer,
+  consider text,
+  created timestamp NOT NULL
+);
+CREATE TABLE IF NOT EXISTS monster_stats (
+  monster_id integer PRIMARY KEY REFERENCES monster (id),
+  killcount integer NOT NULL,
+  median_exp integer NOT NULL,
+  mean_exp double precision NOT NULL,
+  min_exp integer NOT NULL,
+  max_exp integer NOT NULL,
+  last_kill timestamp NOT NULL
+);
+CREATE INDEX IF NOT EXISTS monster_area_id ON monster (area_id);
+CREATE INDEX IF NOT EXISTS kill_monster_id_created ON kill (monster_id, created);
+CREATE INDEX IF NOT EXISTS monsterlvl_monster_id ON monsterlvl (monster_id);
+"""
+
+    def __init__(self, dsn: str):
+        import psycopg2  # type: ignore
+
+        self.dsn = dsn
+        self.connectionErrors = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+    def connect(self) -> Any:
+        import psycopg2  # type: ignore
+        import psycopg2.extras  # type: ignore
+
+        return psycopg2.connect(
+            self.dsn, cursor_factory=psycopg2.extras.NamedTupleCursor
+        )
+
+    def createSchema(self, cursor):
+        cursor.execute(self.SCHEMA)
+        self.fillStats(cursor)
+
+    def insertKills(
+        self, cursor, kills: Sequence[Tuple[int, int]]
+    ) -> Tuple[int, List[KillStats]]:
+        from psycopg2.extras import execute_values  # type: ignore
+
+        if len(kills) == 0:
+            return (0, [])
+        rows = execute_values(
+            cursor, self.KILLS_INSERT, kills, page_size=len(kills), fetch=True
+        )
+        if len(rows) == 0:
+            return (0, [])
+        cursor.execute(
+            self.MONSTER_STATS_UPSERT,
+            {"monsterIds": list({row.monster_id for row in rows})},
+        )
+        stats = [(row.monster_id, row.killcount, row.exp) for row in cursor.fetchall()]
+        return (len(rows), stats)
+
+    def rebuildStats(self, cursor):
+        cursor.execute(self.MONSTER_STATS_REBUILD)
+
+
+@lru_cache(maxsize=64)
+def _rowType(description: Tuple[Tuple[Any, ...], ...]) -> Any:
+    fields = [column[0] for column in description]
+    return namedtuple("Row", fields, rename=True)  # type: ignore
+
+
+def namedTupleRow(cursor, row: Tuple[Any, ...]) -> Any:
+    """
+    sqlite3 row factory giving rows with attributes like NamedTupleCursor
+    """
+    return _rowType(cursor.description)._make(row)
+
+
+class SqliteStore(Store):
+    """
+    The mobinfo database in a local SQLite file, needs no server
+
+    Names are compared case insensitively like ILIKE with NOCASE columns.
+    Spells and skills are JSON lists. Needs SQLite 3.35 for RETURNING.
+    """
+
+    AREA_BY_NAME = """SELECT
+  a.id
+FROM
+  area as a
+  INNER JOIN areaname AS an ON a.id = an.area_id
+WHERE
+  an.name LIKE :area
+"""
+
+    AREA_INSERT = """INSERT INTO
+  area
+DEFAULT VALUES RETURNING id"""
+
+    AREANAME_INSERT = """INSERT INTO
+  areaname (name, \"default\", wiki, batshoppe, area_id)
+VALUES
+  (:area, 1, 0, 0, :areaId)
+"""
+
+    MONSTERS_BY_AREA = """SELECT
+  m.id,
+  m.name,
+  m.shortname,
+  m.race,
+  m.gender,
+  m.alignment,
+  m.aggro,
+  m.spells,
+  m.skills,
+  m.wikiexp,
+  coalesce(s.killcount, 0) as killcount,
+  (s.median_exp + 999) / 1000 as exp,
+  m.room_id,
+  m.area_id
+FROM
+  monster AS m
+  LEFT JOIN monster_stats AS s ON s.monster_id = m.id
+WHERE
+  m.area_id = :areaId
+"""
+
+    MONSTER_BY_ID = """SELECT
+  m.id,
+  m.name,
+  m.shortname,
+  m.race,
+  m.gender,
+  m.alignment,
+  m.aggro,
+  m.spells,
+  m.skills,
+  m.wikiexp,
+  coalesce(s.killcount, 0) as killcount,
+  (s.median_exp + 999) / 1000 as exp,
+  m.room_id,
+  m.area_id
+FROM
+  monster AS m
+  LEFT JOIN monster_stats AS s ON s.monster_id = m.id
+WHERE
+  m.id = :monsterId
+"""
+
+    MONSTER_ID_BY_NAME = """SELECT
+  id
+FROM
+  monster
+WHERE
+  (name LIKE :name OR name LIKE :nameUndead) AND room_id IS NULL
+"""
+
+    MONSTER_INSERT = """INSERT INTO
+  monster (name, area_id, room_id, created)
+VALUES
+  (:name, :areaId, :roomId, datetime('now'))
+RETURNING id
+"""
+
+    MONSTER_AREA_UPDATE = """UPDATE
+  monster
+SET
+  (name, area_id, room_id) = (:name, :areaId, :roomId)
+WHERE
+  id = :monsterId
+"""
+
+    MONSTER_SHORTNAME_UPDATE = """UPDATE
+  monster
+SET
+  shortname = :shortname
+WHERE
+  id = :monsterId
+"""
+
+    MONSTER_ALIGNMENT_UPDATE = """UPDATE
+  monster
+SET
+  alignment = :alignment
+WHERE
+  id = :monsterId
+"""
+
+    MONSTER_MOBLOOK_UPDATE = """UPDATE
+  monster
+SET
+  (shortname, gender, race, description, eqs, aggro) = (:shortname, :gender, :race, :description, :eqs, :aggro)
+WHERE
+  id = :monsterId
+"""
+
+    LEVEL_INSERT = """INSERT INTO
+  monsterlvl (monster_id, ownlvl, consider, created)
+SELECT
+  :monsterId,
+  :ownlvl,
+  :consider,
+  strftime('%Y-%m-%d %H:%M:%f', :created, 'unixepoch')
+WHERE
+  NOT EXISTS (
+    SELECT
+      1
+    FROM
+      monsterlvl
+    WHERE
+      monster_id = :monsterId
+      AND created = strftime('%Y-%m-%d %H:%M:%f', :created, 'unixepoch')
+  )
+"""
+
+    KILLS_INSERT = """INSERT INTO
+  kill (monster_id, exp, created)
+SELECT DISTINCT
+  v.column1,
+  v.column2,
+  datetime('now')
+FROM
+  (VALUES {0}) AS v
+WHERE
+  NOT EXISTS (
+    SELECT
+      1
+    FROM
+      kill AS k
+    WHERE
+      k.monster_id = v.column1
+      AND k.exp = v.column2
+      AND k.created >= datetime('now', '-1 day')
+  )
+RETURNING monster_id
+"""
+
+    KILLS_BY_MONSTER = """SELECT
+  exp,
+  created
+FROM
+  kill
+WHERE
+  monster_id = ?
+"""
+
+    MONSTER_STATS_UPSERT = """INSERT INTO
+  monster_stats (monster_id, killcount, median_exp, mean_exp, min_exp, max_exp, last_kill)
+VALUES
+  (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (monster_id) DO UPDATE SET
+  (killcount, median_exp, mean_exp, min_exp, max_exp, last_kill) = (
+    excluded.killcount, excluded.median_exp, excluded.mean_exp,
+    excluded.min_exp, excluded.max_exp, excluded.last_kill
+  )
+"""
+
+    SCHEMA = """CREATE TABLE IF NOT EXISTS area (
+  id integer PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS areaname (
+  name text NOT NULL COLLATE NOCASE,
+  "default" boolean NOT NULL,
+  wiki boolean NOT NULL,
+  batshoppe boolean NOT NULL,
+  area_id integer NOT NULL REFERENCES area (id)
+);
+CREATE TABLE IF NOT EXISTS monster (
+  id integer PRIMARY KEY,
+  name text NOT NULL COLLATE NOCASE,
+  shortname text,
+  race text,
+  gender text,
+  alignment text,
+  aggro boolean,
+  spells text,
+  skills text,
+  wikiexp text,
+  description text,
+  eqs text,
+  room_id text,
+  area_id integer REFERENCES area (id),
+  created text NOT NULL
+);
+CREATE TABLE IF NOT EXISTS kill (
+  id integer PRIMARY KEY,
+  monster_id integer NOT NULL REFERENCES monster (id),
+  exp integer NOT NULL,
+  created text NOT NULL
+);
+CREATE TABLE IF NOT EXISTS monsterlvl (
+  id integer PRIMARY KEY,
+  monster_id integer NOT NULL REFERENCES monster (id),
+  ownlvl integer,
+  consider text,
+  created text NOT NULL
+);
+CREATE TABLE IF NOT EXISTS monster_stats (
+  monster_id integer PRIMARY KEY REFERENCES monster (id),
+  killcount integer NOT NULL,
+  median_exp integer NOT NULL,
+  mean_exp real NOT NULL,
+  min_exp integer NOT NULL,
+  max_exp integer NOT NULL,
+  last_kill text NOT NULL
+);
+CREATE INDEX IF NOT EXISTS areaname_name ON areaname (name);
+CREATE INDEX IF NOT EXISTS monster_name ON monster (name);
+CREATE INDEX IF NOT EXISTS monster_area_id ON monster (area_id);
+CREATE INDEX IF NOT EXISTS kill_monster_id_created ON kill (monster_id, created);
+CREATE INDEX IF NOT EXISTS monsterlvl_monster_id ON monsterlvl (monster_id);
+"""
+
+    #: kills in one insert, two parameters each
+    KILLS_PER_INSERT = 500
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def connect(self) -> Any:
+        from sqlite3 import connect
+
+        conn = connect(self.path)
+        conn.row_factory = namedTupleRow
+        return conn
+
+    def createSchema(self, cursor):
+        for statement in self.SCHEMA.split(";\n"):
+            if statement.strip() != "":
+                cursor.execute(statement)
+        self.fillStats(cursor)
+
+    def toMonster(self, row) -> Monster:
+        return Monster(
+            row.id,
+            row.name,
+            row.shortname,
+            row.race,
+            row.gender,
+            row.alignment,
+            bool(row.aggro) if row.aggro is not None else None,
+            loads(row.spells) if row.spells is not None else None,
+            loads(row.skills) if row.skills is not None else None,
+            row.killcount,
+            row.exp,
+            row.wikiexp,
+            row.room_id,
+            row.area_id,
+        )
+
+    def insertKills(
+        self, cursor, kills: Sequence[Tuple[int, int]]
+    ) -> Tuple[int, List[KillStats]]:
+        inserted = 0
+        monsterIds = set()
+        for i in range(0, len(kills), self.KILLS_PER_INSERT):
+            page = kills[i : i + self.KILLS_PER_INSERT]
+            cursor.execute(
+                self.KILLS_INSERT.format(", ".join(["(?, ?)"] * len(page))),
+                [value for kill in page for value in kill],
+            )
+            rows = cursor.fetchall()
+            inserted += len(rows)
+            monsterIds.update(row.monster_id for row in rows)
+        stats = [self._updateStats(cursor, monsterId) for monsterId in monsterIds]
+        return (inserted, stats)
+
+    def rebuildStats(self, cursor):
+        cursor.execute("DELETE FROM monster_stats")
+        cursor.execute("SELECT DISTINCT monster_id FROM kill")
+        for row in cursor.fetchall():
+            self._updateStats(cursor, row.monster_id)
+
+    def _updateStats(self, cursor, monsterId: int) -> KillStats:
+        """
+        Compute the stats of a monster like percentile_disc(0.5) in Postgres
+        """
+        cursor.execute(self.KILLS_BY_MONSTER, (monsterId,))
+        rows = cursor.fetchall()
+        exps = sorted(row.exp for row in rows)
+        median = exps[ceil(len(exps) / 2) - 1]
+        cursor.execute(
+            self.MONSTER_STATS_UPSERT,
+            (
+                monsterId,
+                len(exps),
+                median,
+                sum(exps) / len(exps),
+                exps[0],
+                exps[-1],
+                max(row.created for row in rows),
+            ),
+        )
+        return (monsterId, len(exps), ceil(median / 1000.0))
+
+
+def openStore(database: str) -> Store:
+    """
+    :param database: path of a SQLite file ending with .sqlite, otherwise a
+                     PostgreSQL connection string
+    """
+    if database.endswith(".sqlite") or database == ":memory:":
+        return SqliteStore(database)
+    else:
+        return PostgresStore(database)
@@ -0,0 +1,78 @@
+"""
+All output panes in one process
+
+    python3 outputd.py [--tmux] [PANE=TTY ...]
+
+Listens to the sockets of the chat, status, party, caster and mobinfo panes
+in one event loop, with the same socket files and messages as the pane
+scripts, and draws each pane to its terminal. The terminal is given as
+PANE=TTY, e.g. party=/dev/pts/3, or with --tmux it is the tty of the tmux
+pane titled with the pane name, see batmux.conf. Panes without a terminal
+are not listened to, their scripts can be run separately.
+"""
+from argparse import ArgumentParser
+from asyncio import gather, run
+from subprocess import check_output
+from typing import Dict
+
+import casteroutput
+import chatoutput
+import mobinfooutput
+from outputserver import Pane, serve
+import partyoutput
+import statusoutput
+
+PANES: Dict[str, Pane] = {
+    "chat": chatoutput.PANE,
+    "status": statusoutput.PANE,
+    "party": partyoutput.PANE,
+    "caster": casteroutput.PANE,
+    "mobinfo": mobinfooutput.PANE,
+}
+
+
+def tmuxTtys() -> Dict[str, str]:
+    """
+    :returns: ttys of the tmux panes titled with a pane name
+    """
+    ttys: Dict[str, str] = {}
+    panes = check_output(
+        ["tmux", "list-panes", "-a", "-F", "#{pane_title}\t#{pane_tty}"], text=True
+    )
+    for line in panes.splitlines():
+        (title, _, tty) = line.partition("\t")
+        if title in PANES and title not in ttys:
+            ttys[title] = tty
+    return ttys
+
+
+async def serveAll(ttys: Dict[str, str]):
+    for (name, tty) in ttys.items():
+        PANES[name].setOutput(open(tty, "w", buffering=1))
+    await gather(*[serve(PANES[name]) for name in ttys])
+
+
+def main():
+    parser = ArgumentParser(prog="python3 outputd.py")
+    parser.add_argument(
+        "--tmux", action="store_true", help="draw to the tmux panes titled PANE"
+    )
+    parser.add_argument(
+        "ttys", nargs="*", metavar="PANE=TTY", help="draw the pane to this terminal"
+    )
+    args = parser.parse_args()
+
+    ttys = tmuxTtys() if args.tmux else {}
+    for arg in args.ttys:
+        (name, _, tty) = arg.partition("=")
+        if name not in PANES:
+            parser.error("unknown pane {0}, one of {1}".format(name, ", ".join(PANES)))
+        ttys[name] = tty
+    if len(ttys) == 0:
+        parser.error("no panes to draw")
+
+    run(serveAll(ttys))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+from asyncio import (
+    IncompleteReadError,
+    run,
+    StreamReader,
+    StreamWriter,
+    start_unix_server,
+)
+from os import remove
+from os.path import exists
+from struct import unpack
+from sys import stdout
+from traceback import format_exception_only
+from typing import Optional, TextIO
+
+from screen import Screen
+
+#: larger messages are not from the senders of these scripts, the connection
+#: is closed instead of waiting for that many bytes
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+
+class Connection:
+    """
+    Client of a pane socket, e.g. a TinyFugue session
+    """
+
+    def __init__(self, number: int):
+        #: running number of the connections to the same pane
+        self.number = number
+        self.received = 0
+
+
+class Pane:
+    """
+    Output pane for the messages of one socket
+
+    The messages are the bytes of Connection.send_bytes, or the pickles of
+    Connection.send. A pane draws to out, stdout when run as a script and the
+    terminal of the tmux pane in outputd.py. Any number of clients can be
+    connected at the same time, state decoded from the messages of one
+    client is kept per connection.
+    """
+
+    def __init__(self, socketFile: str, screen: Optional[Screen] = None):
+        """
+        :param screen: screen of a pane that draws with it, drawn again in
+                       full after log messages
+        """
+        self.socketFile = socketFile
+        self.screen = screen
+        self.out: TextIO = stdout
+
+    def setOutput(self, out: TextIO):
+        self.out = out
+        if self.screen is not None:
+            self.screen.out = out
+
+    def log(self, message: str):
+        """
+        Write a line about the connections to the pane
+        """
+        if self.screen is not None:
+            self.screen.write(message + "\n")
+        else:
+            print(message, file=self.out)
+
+    def start(self):
+        """
+        Called once before listening to the socket
+        """
+        pass
+
+    def connected(self, conn: Connection):
+        pass
+
+    def received(self, conn: Connection, data: bytes):
+        pass
+
+    def closed(self, conn: Connection):
+        pass
+
+
+async def readMessage(reader: StreamReader) -> bytes:
+    """
+    Read one message framed by multiprocessing.connection, a 4 byte big
+    endian length, or -1 and an 8 byte length, followed by the message
+
+    :raises IncompleteReadError: connection was closed
+    :raises ValueError: length is negative or over MAX_MESSAGE_SIZE
+    """
+    (size,) = unpack("!i", await reader.readexactly(4))
+    if size == -1:
+        (size,) = unpack("!Q", await reader.readexactly(8))
+    if size < 0 or size > MAX_MESSAGE_SIZE:
+        raise ValueError("message of {0} bytes".format(size))
+    return await reader.readexactly(size)
+
+
+def errorString(e: BaseException) -> str:
+    return "".join(format_exception_only(type(e), e)).strip()
+
+
+async def serve(pane: Pane):
+    """
+    Serve the pane from its socket in the running event loop
+
+    Each client is read concurrently. A client that closes or crashes only
+    ends its own connection, and a message the pane fails to handle is
+    skipped.
+    """
+    connections = 0
+
+    async def client(reader: StreamReader, writer: StreamWriter):
+        nonlocal connections
+        connections += 1
+        conn = Connection(connections)
+        pane.connected(conn)
+        try:
+            while True:
+                data = await readMessage(reader)
+                conn.received += 1
+                try:
+                    pane.received(conn, data)
+                except Exception as e:
+                    pane.log(
+                        "connection {0}, skipped message: {1}".format(
+                            conn.number, errorString(e)
+                        )
+                    )
+        except (IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as e:
+            pane.log(
+                "connection {0}, bad frame: {1}".format(conn.number, errorString(e))
+            )
+        finally:
+            writer.close()
+            pane.closed(conn)
+
+    pane.start()
+    # a socket file left by a previous process is replaced
+    server = await start_unix_server(client, pane.socketFile)
+    pane.log("listening to connections on {0}".format(pane.socketFile))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if exists(pane.socketFile):
+            remove(pane.socketFile)
+
+
+def listen(pane: Pane):
+    """
+    Serve the pane from its socket until interrupted, for the pane scripts
+    """
+    try:
+        run(serve(pane))
+    except KeyboardInterrupt:
+        pass
@@ -1,20 +1,43 @@
-import dill  # type: ignore
 from json import loads as loadJson
 from itertools import groupby
-from multiprocessing.connection import Client
 from os import getuid
 from re import sub as reSub
-from shlex import split
 from time import sleep, time
 from tf import eval as tfeval  # type: ignore
-from typing import cast, FrozenSet, Mapping, NamedTuple, Optional, Sequence, Set
+from typing import (
+    cast,
+    Dict,
+    FrozenSet,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+)
 
-from partytypes import Member, MemberDataSource, Place, State
+from partytypes import (
+    encodeDelta,
+    encodeKeyframe,
+    Member,
+    MemberDataSource,
+    Place,
+    Replica,
+    State,
+)
+from sender import QueuePolicy, Sender
 from tfutils import tfprint
-from utils import NoValue, strtoi
+from utils import NoValue, split, strtoi
 
 SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-party".format(getuid())
-CONN = Client(SOCKET_FILE, "AF_UNIX")
+
+#: full state is sent after this many deltas or seconds, so that a restarted
+#: partyoutput.py gets back in sync
+KEYFRAME_INTERVAL = 50
+KEYFRAME_SECONDS = 5.0
+
+#: updates within this window are merged and only the latest state is sent,
+#: the PROMPT hook sends immediately
+COALESCE_SECONDS = 0.04
 
 
 #: binds for targetting party members
@@ -80,38 +103,66 @@ def parseMessage(message) -> Member:
     """
     Parse incoming party update message
 
-    :param message: message as a string with fields separated by spaces
-    :returns: dictionary with fields and their respective values
-              boolean and number fields are converted to respective
+    :param message: message as a string with fields separated by spaces,
+                    see PARTY_STATUS_UPDATE_FIELDS
+    :returns: member with boolean and number fields converted to respective
               python data types
     """
-    d = dict(zip(PARTY_STATUS_UPDATE_FIELDS, split(message)))
-
-    x = strtoi(d["place_x"])
-    y = strtoi(d["place_y"])
+    (
+        player,
+        race,
+        gender,
+        level,
+        hp,
+        maxhp,
+        sp,
+        maxsp,
+        ep,
+        maxep,
+        partyName,
+        placeX,
+        placeY,
+        creator,
+        formation,
+        member,
+        entry,
+        following,
+        leader,
+        linkdead,
+        resting,
+        idle,
+        invisible,
+        dead,
+        stunned,
+        unconscious,
+        *_,
+    ) = split(message)
+
+    x = strtoi(placeX)
+    y = strtoi(placeY)
     place = None if x == None or y == None else Place(cast(int, x), cast(int, y))
 
     return Member(
-        str(d["player"]),
-        int(d["hp"]),
-        int(d["maxhp"]),
-        int(d["sp"]),
-        int(d["maxsp"]),
-        int(d["ep"]),
-        int(d["maxep"]),
+        player,
+        int(hp),
+        int(maxhp),
+        int(sp),
+        int(maxsp),
+        int(ep),
+        int(maxep),
         place,
-        bool(d["formation"] == "1"),
-        bool(d["member"] == "1"),
-        bool(d["entry"] == "1"),
-        bool(d["following"] == "1"),
-        bool(d["leader"] == "1"),
-        bool(d["linkdead"] == "1"),
-        bool(d["resting"] == "1"),
-        bool(d["idle"] == "1"),
-        bool(d["invisible"] == "1"),
-        bool(d["dead"] == "1"),
-        int(d["stunned"]),
-        int(d["unconscious"]),
+        formation == "1",
+        member == "1",
+        entry == "1",
+        following == "1",
+        leader == "1",
+        linkdead == "1",
+        resting == "1",
+        idle == "1",
+        invisible == "1",
+        dead == "1",
+        int(stunned),
+        int(unconscious),
         None,
         time(),
         MemberDataSource.BCPROXY,
@@ -119,8 +170,14 @@ def parseMessage(message) -> Member:
 
 
 def parseMinionHpStatusMessage(message) -> Optional[Member]:
-    d = dict(zip(MINION_HP_STATUS_FIELDS, split(message)))
-    name = str(d["minion"]).capitalize()
+    """
+    Parse incoming minion hp status message, see MINION_HP_STATUS_FIELDS
+
+    :returns: minion with places and states from the earlier pss, None if
+              the minion is not known yet
+    """
+    (player, minion, _, hp, maxhp, sp, maxsp, ep, maxep, *_) = split(message)
+    name = normalizeName(minion)
 
     member = getMemberByName(name)
 
@@ -131,12 +188,12 @@ def parseMinionHpStatusMessage(message) -> Optional[Member]:
 
     return Member(
         name,
-        int(d["hp"]),
-        int(d["maxhp"]),
-        int(d["sp"]),
-        int(d["maxsp"]),
-        int(d["ep"]),
-        int(int(d["maxep"]) / 10),
+        int(hp),
+        int(maxhp),
+        int(sp),
+        int(maxsp),
+        int(ep),
+        int(int(maxep) / 10),
         member.place,
         member.formation,
         member.member,
@@ -157,11 +214,7 @@ def parseMinionHpStatusMessage(message) -> Optional[Member]:
 
 
 def getMemberByName(name: str) -> Optional[Member]:
-    global state
-    for member in state.members:
-        if member.name == name:
-            return member
-    return None
+    return members.get(name)
 
 
 UNKNOWN_PLACES: Sequence[Place] = [
@@ -190,51 +243,105 @@ VALID_PLACES: FrozenSet[Place] = frozenset(
 )
 
 
+def normalizeName(name: str) -> str:
+    """
+    Key for the member, pss has + prefix for minions and minion hp status
+    has minion names in lowercase
+
+    Only the first letter is uppercased, the rest of the name is kept so
+    that e.g. McBat and Mcbat are different members.
+    """
+    n = name.lstrip("+")
+    return n[:1].upper() + n[1:]
+
+
+class MemberStore:
+    """
+    Party members by normalized name, with the place index for
+    calculatePlaces
+
+    state.members is the immutable snapshot of the store for sending.
+    """
+
+    def __init__(self):
+        self.byName: Dict[str, Member] = {}
+        #: members in valid formation places by place and name
+        self.byPlace: Dict[Place, Dict[str, Member]] = {}
+        #: members with unknown or out-of-formation place by name
+        self.unplaced: Dict[str, Member] = {}
+        self.cachedSnapshot: Optional[FrozenSet[Member]] = frozenset()
+
+    def get(self, name: str) -> Optional[Member]:
+        return self.byName.get(normalizeName(name))
+
+    def upsert(self, member: Member):
+        key = normalizeName(member.name)
+        self._unindex(key)
+        self.byName[key] = member
+        if member.place in VALID_PLACES:
+            self.byPlace.setdefault(cast(Place, member.place), {})[key] = member
+        else:
+            self.unplaced[key] = member
+        self.cachedSnapshot = None
+
+    def remove(self, name: str) -> Optional[Member]:
+        key = normalizeName(name)
+        member = self._unindex(key)
+        if member is not None:
+            del self.byName[key]
+            self.cachedSnapshot = None
+        return member
+
+    def clear(self):
+        self.byName.clear()
+        self.byPlace.clear()
+        self.unplaced.clear()
+        self.cachedSnapshot = frozenset()
+
+    def snapshot(self) -> FrozenSet[Member]:
+        if self.cachedSnapshot is None:
+            self.cachedSnapshot = frozenset(self.byName.values())
+        return self.cachedSnapshot
+
+    def _unindex(self, key: str) -> Optional[Member]:
+        member = self.byName.get(key)
+        if member is None:
+            return None
+        if member.place in VALID_PLACES:
+            inPlace = self.byPlace[cast(Place, member.place)]
+            del inPlace[key]
+            if len(inPlace) == 0:
+                del self.byPlace[cast(Place, member.place)]
+        else:
+            del self.unplaced[key]
+        return member
+
+
 def calculatePlaces():
     global state
 
-    noPlace: Set[Member] = set([])
-    places: Mapping[Place, Member] = {}
-
-    for member in state.members:
-        # unknown place
-        if member.place == None or member.place not in VALID_PLACES:
-            noPlace.add(member)
-            continue
-
-        membersInThisPlaceUpdatedAt = map(
-            lambda m: m.updatedAt,
-            filter(lambda m: m.place == member.place, state.members),
-        )
-
-        # allMembersInThisPlaceFromBcproxy = True
-        allMembersInThisPlaceFromBcproxy = (
-            len(
-                list(
-                    filter(
-                        lambda m: m.source == MemberDataSource.PSS
-                        and m.place == member.place,
-                        state.members,
-                    )
-                )
-            )
-            == 0
-        )
+    noPlace: Set[Member] = set(members.unplaced.values())
+    places: Dict[Place, Member] = {}
 
+    for (place, inPlace) in members.byPlace.items():
         # PSS is the authoritiative source for member location as it includes
         # also the nergal minions and riftwalker entities
         #
-        # for bcproxy-only, if this is the most recent update for this place,
-        # set it here
+        # for bcproxy-only, the most recent update for this place is set here
         #
         # this also works if there is only one member for this place
-        if member.source == MemberDataSource.PSS or (
-            allMembersInThisPlaceFromBcproxy
-            and member.updatedAt == max(membersInThisPlaceUpdatedAt)
-        ):
-            places[member.place] = member
+        fromPss = [m for m in inPlace.values() if m.source == MemberDataSource.PSS]
+        if len(fromPss) > 0:
+            places[place] = max(fromPss, key=lambda m: m.updatedAt)
+            noPlace.update(
+                [m for m in inPlace.values() if m.source != MemberDataSource.PSS]
+            )
         else:
-            noPlace.add(member)
+            newest = max(inPlace.values(), key=lambda m: m.updatedAt)
+            places[place] = newest
+            noPlace.update(
+                [m for m in inPlace.values() if m.updatedAt < newest.updatedAt]
+            )
 
     # check if members with unknown place can be left to their previous place
     for member in noPlace.copy():
@@ -257,9 +364,41 @@ def calculatePlaces():
     state = state._replace(places=places)
 
 
+def encodeUpdate(newState: State) -> bytes:
+    """
+    Keyframe or delta for the new state, called in the sender thread
+    """
+    global sent, keyframeAt
+    seq = 1 if sent is None else sent.seq + 1
+    now = time()
+    if (
+        sent is None
+        or seq % KEYFRAME_INTERVAL == 0
+        or now - keyframeAt > KEYFRAME_SECONDS
+    ):
+        data = encodeKeyframe(seq, newState)
+        keyframeAt = now
+    else:
+        data = encodeDelta(sent, seq, newState)
+    sent = Replica(seq, newState)
+    return data
+
+
+def resetUpdates():
+    """
+    Start with a keyframe after (re)connecting to partyoutput.py
+    """
+    global sent
+    sent = None
+
+
 def sendState():
     global state
-    CONN.send_bytes(dill.dumps(state))
+    CONN.send(state)
+
+
+def prompt(s: str):
+    CONN.flush()
 
 
 def changeTargetName(name: str):
@@ -297,15 +436,8 @@ def pssEnd(opts):
 
 def handleNewMember(newMember: Member):
     global state
-    newMembers = set(
-        [
-            newMember if member.name == newMember.name else member
-            for member in state.members
-        ]
-    )
-    if newMember not in newMembers:
-        newMembers.add(newMember)
-    state = state._replace(members=frozenset(newMembers))
+    members.upsert(newMember)
+    state = state._replace(members=members.snapshot())
     calculatePlaces()
     sendState()
 
@@ -323,18 +455,12 @@ def triggerMinionHpStatusMsg(msg: str):
 
 def triggerPartyLeave(msg: str):
     global state
-    member = msg.capitalize()
-    toBeRemoved = None
-    for m in state.members:
-        if member == m.name:
-            toBeRemoved = m
-        if m.name == "Astrax" or m.name == "Ruska":
-            state = State(frozenset([]), {}, {}, None, False, False)
-            return
-    if toBeRemoved:
-        newMembers = set(state.members)
-        newMembers.remove(toBeRemoved)
-        state = state._replace(members=frozenset(newMembers))
+    if members.get("Astrax") is not None or members.get("Ruska") is not None:
+        state = State(frozenset([]), {}, {}, None, False, False)
+        members.clear()
+        return
+    if members.remove(msg):
+        state = state._replace(members=members.snapshot())
         calculatePlaces()
         sendState()
 
@@ -520,9 +646,25 @@ def setup():
         + "\\\`-----------------------------------------------------------------------------'"
         + "` party_pss_end = /python_call party.pssEnd"
     )
+    # prompt must be matched from hook PROMPT
+    tfeval(
+        "/def -p10 -F -mglob -h`PROMPT PROMPT:*` party_prompt = "
+        + "/python_call party.prompt"
+    )
 
     tfprint("Loaded party.py")
 
 
 setup()
 state = State(frozenset([]), {}, {}, None, False, False)
+members = MemberStore()
+#: last state sent to partyoutput.py, only used in the sender thread
+sent: Optional[Replica] = None
+keyframeAt = 0.0
+CONN = Sender(
+    SOCKET_FILE,
+    QueuePolicy.COALESCE_LATEST,
+    encode=encodeUpdate,
+    onConnect=resetUpdates,
+    delay=COALESCE_SECONDS,
+)
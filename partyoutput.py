@@ -1,9 +1,11 @@
-import dill  # type: ignore
-from multiprocessing.connection import Listener
+from asyncio import get_running_loop, TimerHandle
 from os import getuid
-from typing import cast, NamedTuple, Optional, Tuple
+from time import monotonic
+from typing import cast, Dict, List, NamedTuple, Optional, Tuple
 
-from partytypes import Member, Place, State
+from outputserver import Connection, listen, Pane
+from partytypes import decodeUpdate, Member, Place, Replica, State
+from screen import Rows, Screen
 from utils import Color, colorize
 
 SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-party".format(getuid())
@@ -15,10 +17,15 @@ YELLOW = Color(0xFF, 0xFF, 0)
 WHITE = Color(0xFF, 0xFF, 0xFF)
 OUT_OF_FORMATION_COLOR = Color(204, 153, 255)
 
+#: updates arriving within this window after the previous frame are merged
+#: and only the latest state is drawn
+FRAME_SECONDS = 0.04
 
-def draw(s):
-    print("\033c", end="")  # clear screen
-    print(s)
+SCREEN = Screen()
+
+
+def draw(rows: Rows):
+    SCREEN.draw(rows)
 
 
 def getMemberState(member: Member) -> Tuple[str, Optional[Color]]:
@@ -143,32 +150,81 @@ def greenRedGradient(
     return Color(r, g, 0)
 
 
-def getStatus(state: State) -> str:
-    s = ""
-    hasCol4 = Place(4, 1) in state.places
+def getCells(state: State) -> List[List[str]]:
+    """
+    Status as rows of cells for the screen, two rows per formation row
+    """
+    rows = []
     for y in range(0, 4):
         col1 = lines(state, Place(1, y + 1))
         col2 = lines(state, Place(2, y + 1))
         col3 = lines(state, Place(3, y + 1))
         col4 = lines(state, Place(4, y + 1))
 
-        s += "{0} {1} {2} {3}\n".format(col4[0], col1[0], col2[0], col3[0])
-        s += "{0} {1} {2} {3}\n".format(col4[1], col1[1], col2[1], col3[1])
-    return s
+        rows.append([col4[0], col1[0], col2[0], col3[0]])
+        rows.append([col4[1], col1[1], col2[1], col3[1]])
+    return rows
 
 
-with Listener(SOCKET_FILE, "AF_UNIX") as listener:
-    print("listening to connections on {0}".format(SOCKET_FILE))
+def getStatus(state: State) -> str:
+    return "".join([" ".join(row) + "\n" for row in getCells(state)])
+
 
-    while True:
-        with listener.accept() as conn:
-            print("connection opened", listener.last_accepted)
+class PartyPane(Pane):
+    """
+    Draws the replica of the party state, at most one frame in FRAME_SECONDS
+
+    Updates are decoded against the replica of their own connection, the
+    one updated last is drawn.
+    """
 
-            while True:
-                try:
-                    state = cast(State, dill.loads(conn.recv_bytes()))
-                    status = getStatus(state)
-                    draw(status)
-                except EOFError:
-                    print("connection closed")
-                    break
+    def __init__(self, socketFile: str, screen: Screen):
+        super().__init__(socketFile, screen)
+        self.replicas: Dict[int, Optional[Replica]] = {}
+        self.replica: Optional[Replica] = None
+        self.drawn: Optional[Replica] = None
+        self.frameAt = 0.0
+        self.frame: Optional[TimerHandle] = None
+        self.framesDrawn = 0
+
+    def connected(self, conn: Connection):
+        self.log("connection {0} opened".format(conn.number))
+        self.replicas[conn.number] = None
+        self.drawn = None
+
+    def drawFrame(self):
+        self.frame = None
+        if self.replica is not self.drawn and self.replica is not None:
+            self.drawn = self.replica
+            self.frameAt = monotonic()
+            self.framesDrawn += 1
+            draw(getCells(self.replica.state))
+
+    def received(self, conn: Connection, data: bytes):
+        """
+        The frame is drawn once the window after the previous one has passed
+        """
+        replica = decodeUpdate(self.replicas[conn.number], data)
+        self.replicas[conn.number] = replica
+        self.replica = replica
+        if self.frame is None:
+            self.frame = get_running_loop().call_later(
+                max(0.0, self.frameAt + FRAME_SECONDS - monotonic()), self.drawFrame
+            )
+
+    def closed(self, conn: Connection):
+        del self.replicas[conn.number]
+        if self.frame is not None:
+            self.frame.cancel()
+            self.drawFrame()
+        self.log(
+            "connection {0} closed, {1} updates, {2} frames".format(
+                conn.number, conn.received, self.framesDrawn
+            )
+        )
+
+
+PANE = PartyPane(SOCKET_FILE, SCREEN)
+
+if __name__ == "__main__":
+    listen(PANE)
@@ -1,4 +1,6 @@
-from typing import FrozenSet, Mapping, NamedTuple, Optional
+import dill  # type: ignore
+from struct import Struct
+from typing import Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Tuple
 from utils import NoValue
 
 
@@ -46,3 +48,465 @@ class State(NamedTuple):
     target: Optional[str]
     pssHasMinions: bool
     manualMinions: bool
+
+
+#: wire format version, the first byte of every encoded state
+#: dill pickles start with 0x80, so anything else is decoded with dill
+WIRE_VERSION = 1
+#: full state with a sequence number, followed by a WIRE_VERSION state
+WIRE_KEYFRAME = 2
+#: changes since the replica with the base sequence number
+WIRE_DELTA = 3
+
+#: version, flags, strings, members, member table, places, previous places,
+#: target string index
+WIRE_HEADER = Struct("<BBHHHHHH")
+WIRE_STRING_LENGTH = Struct("<H")
+#: version, sequence number
+WIRE_KEYFRAME_HEADER = Struct("<BI")
+#: version, base sequence number, sequence number, flags, strings, added,
+#: updated, removed, places, previous places, removed previous places,
+#: target string index
+WIRE_DELTA_HEADER = Struct("<BIIB8H")
+WIRE_STRING_INDEX = Struct("<H")
+#: name index, hp, maxhp, sp, maxsp, ep, maxep, place x, place y, flags,
+#: stunned, unconscious, updatedAt, source
+WIRE_MEMBER = Struct("<H6ibbHhhdB")
+#: x, y, member table index (string index of the name in deltas)
+WIRE_PLACE = Struct("<bbH")
+#: name string index, x, y
+WIRE_PREVIOUS_PLACE = Struct("<Hbb")
+
+WIRE_NO_STRING = 0xFFFF
+WIRE_NO_INT = -(2 ** 31)
+WIRE_NO_BYTE = -128
+
+WIRE_STATE_PSS_HAS_MINIONS = 1
+WIRE_STATE_MANUAL_MINIONS = 2
+
+#: member flag bits, formation to dead take the lowest ten bits in field order
+WIRE_MEMBER_NO_PLACE = 1 << 10
+WIRE_MEMBER_AMBUSHED_KNOWN = 1 << 11
+WIRE_MEMBER_AMBUSHED = 1 << 12
+
+WIRE_SOURCES: List[MemberDataSource] = list(MemberDataSource)
+WIRE_SOURCE_INDEX: Mapping[MemberDataSource, int] = {
+    source: i for (i, source) in enumerate(WIRE_SOURCES)
+}
+
+
+def _toWireByte(n: Optional[int]) -> int:
+    return WIRE_NO_BYTE if n is None else n
+
+
+def _fromWireByte(n: int) -> Optional[int]:
+    return None if n == WIRE_NO_BYTE else n
+
+
+class Replica(NamedTuple):
+    """
+    Party state as known by the receiving end of the delta updates
+    """
+
+    seq: int
+    state: State
+
+
+class _StringTable:
+    def __init__(self):
+        self.indexes: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def index(self, s: str) -> int:
+        i = self.indexes.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.indexes[s] = i
+            self.strings.append(s)
+        return i
+
+    def pack(self) -> bytes:
+        parts = []
+        for s in self.strings:
+            encoded = s.encode()
+            parts.append(WIRE_STRING_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+        return b"".join(parts)
+
+
+def _unpackStrings(data: bytes, offset: int, n: int) -> Tuple[List[str], int]:
+    strings: List[str] = []
+    for _ in range(n):
+        (length,) = WIRE_STRING_LENGTH.unpack_from(data, offset)
+        offset += WIRE_STRING_LENGTH.size
+        strings.append(data[offset : offset + length].decode())
+        offset += length
+    return (strings, offset)
+
+
+def _packMember(member: Member, strings: _StringTable) -> bytes:
+    flags = (
+        member.formation
+        | member.member << 1
+        | member.entry << 2
+        | member.following << 3
+        | member.leader << 4
+        | member.linkdead << 5
+        | member.resting << 6
+        | member.idle << 7
+        | member.invisible << 8
+        | member.dead << 9
+    )
+    if member.place is None:
+        flags |= WIRE_MEMBER_NO_PLACE
+        x, y = None, None
+    else:
+        x, y = member.place
+    if member.ambushed is not None:
+        flags |= WIRE_MEMBER_AMBUSHED_KNOWN
+        if member.ambushed:
+            flags |= WIRE_MEMBER_AMBUSHED
+
+    return WIRE_MEMBER.pack(
+        strings.index(member.name),
+        WIRE_NO_INT if member.hp is None else member.hp,
+        WIRE_NO_INT if member.maxhp is None else member.maxhp,
+        WIRE_NO_INT if member.sp is None else member.sp,
+        WIRE_NO_INT if member.maxsp is None else member.maxsp,
+        WIRE_NO_INT if member.ep is None else member.ep,
+        WIRE_NO_INT if member.maxep is None else member.maxep,
+        _toWireByte(x),
+        _toWireByte(y),
+        flags,
+        member.stunned,
+        member.unconscious,
+        member.updatedAt,
+        WIRE_SOURCE_INDEX[member.source],
+    )
+
+
+def _unpackMember(record: Tuple, strings: List[str]) -> Member:
+    (name, hp, maxhp, sp, maxsp, ep, maxep, x, y, flags) = record[:10]
+    return Member(
+        strings[name],
+        None if hp == WIRE_NO_INT else hp,
+        None if maxhp == WIRE_NO_INT else maxhp,
+        None if sp == WIRE_NO_INT else sp,
+        None if maxsp == WIRE_NO_INT else maxsp,
+        None if ep == WIRE_NO_INT else ep,
+        None if maxep == WIRE_NO_INT else maxep,
+        None
+        if flags & WIRE_MEMBER_NO_PLACE
+        else Place(_fromWireByte(x), _fromWireByte(y)),  # type: ignore
+        flags & 1 != 0,
+        flags & 2 != 0,
+        flags & 4 != 0,
+        flags & 8 != 0,
+        flags & 16 != 0,
+        flags & 32 != 0,
+        flags & 64 != 0,
+        flags & 128 != 0,
+        flags & 256 != 0,
+        flags & 512 != 0,
+        record[10],
+        record[11],
+        flags & WIRE_MEMBER_AMBUSHED != 0
+        if flags & WIRE_MEMBER_AMBUSHED_KNOWN
+        else None,
+        record[12],
+        WIRE_SOURCES[record[13]],
+    )  # type: ignore
+
+
+def encodeState(state: State) -> bytes:
+    """
+    Encode party state to the compact wire format
+
+    Layout after the header: string table (length prefixed utf-8), member
+    table (state.members first, then place members missing from it), places
+    as member table indexes and previous places as string table indexes.
+
+    :param state: party state
+    :returns: encoded state, starting with WIRE_VERSION
+    """
+    strings = _StringTable()
+    table: List[Member] = list(state.members)
+    tableIndexes: Dict[Member, int] = {m: i for (i, m) in enumerate(table)}
+    for member in state.places.values():
+        if member not in tableIndexes:
+            tableIndexes[member] = len(table)
+            table.append(member)
+
+    members = b"".join([_packMember(m, strings) for m in table])
+    places = b"".join(
+        [
+            WIRE_PLACE.pack(_toWireByte(p.x), _toWireByte(p.y), tableIndexes[m])
+            for (p, m) in state.places.items()
+        ]
+    )
+    previousPlaces = b"".join(
+        [
+            WIRE_PREVIOUS_PLACE.pack(
+                strings.index(name), _toWireByte(p.x), _toWireByte(p.y)
+            )
+            for (name, p) in state.previousPlaces.items()
+        ]
+    )
+    target = WIRE_NO_STRING if state.target is None else strings.index(state.target)
+
+    flags = 0
+    if state.pssHasMinions:
+        flags |= WIRE_STATE_PSS_HAS_MINIONS
+    if state.manualMinions:
+        flags |= WIRE_STATE_MANUAL_MINIONS
+
+    parts = [
+        WIRE_HEADER.pack(
+            WIRE_VERSION,
+            flags,
+            len(strings.strings),
+            len(state.members),
+            len(table),
+            len(state.places),
+            len(state.previousPlaces),
+            target,
+        )
+    ]
+    parts.append(strings.pack())
+    parts.append(members)
+    parts.append(places)
+    parts.append(previousPlaces)
+    return b"".join(parts)
+
+
+def decodeState(data: bytes) -> State:
+    """
+    Decode party state encoded with encodeState
+
+    Unknown versions are expected to be dill pickles from older senders.
+
+    :param data: encoded state
+    :returns: party state
+    """
+    if data[:1] != bytes([WIRE_VERSION]):
+        return dill.loads(data)
+
+    (
+        _,
+        flags,
+        nStrings,
+        nMembers,
+        nTable,
+        nPlaces,
+        nPreviousPlaces,
+        target,
+    ) = WIRE_HEADER.unpack_from(data)
+    offset = WIRE_HEADER.size
+
+    (strings, offset) = _unpackStrings(data, offset, nStrings)
+
+    end = offset + nTable * WIRE_MEMBER.size
+    table = [
+        _unpackMember(record, strings)
+        for record in WIRE_MEMBER.iter_unpack(data[offset:end])
+    ]
+    offset = end
+
+    end = offset + nPlaces * WIRE_PLACE.size
+    places = {
+        Place(_fromWireByte(x), _fromWireByte(y)): table[i]  # type: ignore
+        for (x, y, i) in WIRE_PLACE.iter_unpack(data[offset:end])
+    }
+    offset = end
+
+    end = offset + nPreviousPlaces * WIRE_PREVIOUS_PLACE.size
+    previousPlaces = {
+        strings[name]: Place(_fromWireByte(x), _fromWireByte(y))  # type: ignore
+        for (name, x, y) in WIRE_PREVIOUS_PLACE.iter_unpack(data[offset:end])
+    }
+
+    return State(
+        frozenset(table[:nMembers]),
+        places,
+        previousPlaces,
+        None if target == WIRE_NO_STRING else strings[target],
+        bool(flags & WIRE_STATE_PSS_HAS_MINIONS),
+        bool(flags & WIRE_STATE_MANUAL_MINIONS),
+    )
+
+
+def encodeKeyframe(seq: int, state: State) -> bytes:
+    return WIRE_KEYFRAME_HEADER.pack(WIRE_KEYFRAME, seq) + encodeState(state)
+
+
+def encodeDelta(previous: Replica, seq: int, state: State) -> bytes:
+    """
+    Encode the changes from previously sent state to the new one
+
+    Members are identified by name. Places are sent as member names, so the
+    place members must be the ones in state.members.
+
+    :param previous: last state sent and its sequence number
+    :param seq: sequence number for the new state
+    :param state: new party state
+    :returns: encoded delta, starting with WIRE_DELTA
+    """
+    strings = _StringTable()
+    old = {m.name: m for m in previous.state.members}
+    new = {m.name: m for m in state.members}
+
+    added = []
+    updated = []
+    for (name, member) in new.items():
+        oldMember = old.get(name)
+        if oldMember is None:
+            added.append(_packMember(member, strings))
+        elif oldMember != member:
+            updated.append(_packMember(member, strings))
+    removed = [
+        WIRE_STRING_INDEX.pack(strings.index(name)) for name in old if name not in new
+    ]
+
+    oldPlaces = previous.state.places
+    places = [
+        WIRE_PLACE.pack(_toWireByte(p.x), _toWireByte(p.y), strings.index(m.name))
+        for (p, m) in state.places.items()
+        if p not in oldPlaces or oldPlaces[p].name != m.name
+    ]
+    places += [
+        WIRE_PLACE.pack(_toWireByte(p.x), _toWireByte(p.y), WIRE_NO_STRING)
+        for p in oldPlaces
+        if p not in state.places
+    ]
+
+    oldPrevious = previous.state.previousPlaces
+    previousPlaces = [
+        WIRE_PREVIOUS_PLACE.pack(strings.index(name), _toWireByte(p.x), _toWireByte(p.y))
+        for (name, p) in state.previousPlaces.items()
+        if oldPrevious.get(name) != p
+    ]
+    previousRemoved = [
+        WIRE_STRING_INDEX.pack(strings.index(name))
+        for name in oldPrevious
+        if name not in state.previousPlaces
+    ]
+
+    target = WIRE_NO_STRING if state.target is None else strings.index(state.target)
+    flags = 0
+    if state.pssHasMinions:
+        flags |= WIRE_STATE_PSS_HAS_MINIONS
+    if state.manualMinions:
+        flags |= WIRE_STATE_MANUAL_MINIONS
+
+    return b"".join(
+        [
+            WIRE_DELTA_HEADER.pack(
+                WIRE_DELTA,
+                previous.seq,
+                seq,
+                flags,
+                len(strings.strings),
+                len(added),
+                len(updated),
+                len(removed),
+                len(places),
+                len(previousPlaces),
+                len(previousRemoved),
+                target,
+            ),
+            strings.pack(),
+            *added,
+            *updated,
+            *removed,
+            *places,
+            *previousPlaces,
+            *previousRemoved,
+        ]
+    )
+
+
+def _applyDelta(replica: Replica, data: bytes) -> Replica:
+    (
+        _,
+        _,
+        seq,
+        flags,
+        nStrings,
+        nAdded,
+        nUpdated,
+        nRemoved,
+        nPlaces,
+        nPreviousPlaces,
+        nPreviousRemoved,
+        target,
+    ) = WIRE_DELTA_HEADER.unpack_from(data)
+    (strings, offset) = _unpackStrings(data, WIRE_DELTA_HEADER.size, nStrings)
+
+    members = {m.name: m for m in replica.state.members}
+    end = offset + (nAdded + nUpdated) * WIRE_MEMBER.size
+    for record in WIRE_MEMBER.iter_unpack(data[offset:end]):
+        member = _unpackMember(record, strings)
+        members[member.name] = member
+    offset = end
+
+    end = offset + nRemoved * WIRE_STRING_INDEX.size
+    for (name,) in WIRE_STRING_INDEX.iter_unpack(data[offset:end]):
+        members.pop(strings[name], None)
+    offset = end
+
+    placeNames = {p: m.name for (p, m) in replica.state.places.items()}
+    end = offset + nPlaces * WIRE_PLACE.size
+    for (x, y, name) in WIRE_PLACE.iter_unpack(data[offset:end]):
+        place = Place(_fromWireByte(x), _fromWireByte(y))  # type: ignore
+        if name == WIRE_NO_STRING:
+            placeNames.pop(place, None)
+        else:
+            placeNames[place] = strings[name]
+    offset = end
+
+    previousPlaces = dict(replica.state.previousPlaces)
+    end = offset + nPreviousPlaces * WIRE_PREVIOUS_PLACE.size
+    for (name, x, y) in WIRE_PREVIOUS_PLACE.iter_unpack(data[offset:end]):
+        previousPlaces[strings[name]] = Place(
+            _fromWireByte(x), _fromWireByte(y)  # type: ignore
+        )
+    offset = end
+
+    end = offset + nPreviousRemoved * WIRE_STRING_INDEX.size
+    for (name,) in WIRE_STRING_INDEX.iter_unpack(data[offset:end]):
+        previousPlaces.pop(strings[name], None)
+
+    return Replica(
+        seq,
+        State(
+            frozenset(members.values()),
+            {p: members[name] for (p, name) in placeNames.items() if name in members},
+            previousPlaces,
+            None if target == WIRE_NO_STRING else strings[target],
+            bool(flags & WIRE_STATE_PSS_HAS_MINIONS),
+            bool(flags & WIRE_STATE_MANUAL_MINIONS),
+        ),
+    )
+
+
+def decodeUpdate(replica: Optional[Replica], data: bytes) -> Optional[Replica]:
+    """
+    Apply a keyframe, delta or plain state message to the local replica
+
+    Deltas that do not continue from the replica are ignored until the next
+    keyframe, which happens after reconnects or lost messages.
+
+    :param replica: current replica, None before the first keyframe
+    :param data: encoded message
+    :returns: updated replica, or the given one if the delta was ignored
+    """
+    version = data[0]
+    if version == WIRE_DELTA:
+        baseSeq = WIRE_DELTA_HEADER.unpack_from(data)[1]
+        if replica is None or replica.seq != baseSeq:
+            return replica
+        return _applyDelta(replica, data)
+    if version == WIRE_KEYFRAME:
+        (_, seq) = WIRE_KEYFRAME_HEADER.unpack_from(data)
+        return Replica(seq, decodeState(data[WIRE_KEYFRAME_HEADER.size :]))
+    return Replica(0, decodeState(data))
@@ -1,6 +1,5 @@
 import dill  # type: ignore
 from enum import Enum
-from multiprocessing.connection import Client
 from os import getuid
 from tf import eval as tfeval  # type: ignore
 from typing import (
@@ -15,12 +14,14 @@ from typing import (
     Tuple,
 )
 
+from sender import getSender
 from spells import DamType, getDamtypeColor, getSpellByName, Spell
 from statustypes import Message, StatusType
 from tfutils import tfprint
 from utils import colorize
 
 STATUS_SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-status".format(getuid())
+CONN = getSender(STATUS_SOCKET_FILE, encode=dill.dumps)
 
 
 class Resist(Enum):
@@ -88,22 +89,21 @@ def report(mobResist: MobResist):
 
     tfeval("@party report {0}".format(s))
 
-    with Client(STATUS_SOCKET_FILE, "AF_UNIX") as conn:
-        msg = Message(
-            StatusType.RESISTS,
-            "{0} {1}".format(
-                mobResist.name,
-                ", ".join(
-                    map(
-                        lambda r: "{0}: {1}".format(
-                            colorize(r[0].value[:4], getDamtypeColor(r[0])), r[1].value
-                        ),
-                        rs,
-                    )
-                ),
+    msg = Message(
+        StatusType.RESISTS,
+        "{0} {1}".format(
+            mobResist.name,
+            ", ".join(
+                map(
+                    lambda r: "{0}: {1}".format(
+                        colorize(r[0].value[:4], getDamtypeColor(r[0])), r[1].value
+                    ),
+                    rs,
+                )
             ),
-        )
-        conn.send_bytes(dill.dumps(msg))
+        ),
+    )
+    CONN.send(msg)
 
 
 def reportLast(args):
@@ -0,0 +1,151 @@
+from os import get_terminal_size, terminal_size
+from re import compile as reCompile
+from sys import stdout
+from threading import Lock
+from typing import List, Optional, Sequence, TextIO
+
+#: sgr escape sequences used by utils.colorize, they take no room on screen
+SGR_RE = reCompile(r"\033\[[0-9;]*m")
+SGR_SPLIT_RE = reCompile(r"(\033\[[0-9;]*m)")
+
+Rows = Sequence[Sequence[str]]
+
+
+def visibleLength(s: str) -> int:
+    return len(SGR_RE.sub("", s))
+
+
+def clip(s: str, width: int) -> str:
+    """
+    Cut s to width visible characters, colors are reset if it was cut
+    """
+    if visibleLength(s) <= width:
+        return s
+    parts = SGR_SPLIT_RE.split(s)
+    if len(parts) == 1:
+        return s[:width]
+    out = []
+    for (i, part) in enumerate(parts):
+        if i % 2 == 1:
+            out.append(part)
+        else:
+            out.append(part[:width])
+            width -= len(out[-1])
+    return "".join(out) + "\033[0m"
+
+
+def clipRow(row: Sequence[str], width: int, separator: str) -> Sequence[str]:
+    """
+    Cells of the row that fit in width, the last one cut
+    """
+    cells = []
+    x = 0
+    for cell in row:
+        if x >= width:
+            break
+        cells.append(clip(cell, width - x))
+        x += visibleLength(cell) + len(separator)
+    return cells
+
+
+def moveTo(row: int, col: int) -> str:
+    return "\033[{0};{1}H".format(row + 1, col + 1)
+
+
+class Screen:
+    """
+    Incremental terminal renderer for output panes
+
+    Screen content is given as rows of cells, cells in a row are separated by
+    the separator. Only the cells that have changed since the previous draw
+    are written, positioned with cursor movement escapes, so nothing flickers
+    and very few bytes are written for small changes. Cells can contain
+    colors from utils.colorize.
+
+    The whole screen is redrawn after invalidate() and terminal resize. The
+    size is checked on each draw instead of on SIGWINCH, which only tells
+    about the terminal of the process, not the tmux panes of outputd.py.
+    Rows are clipped to the size, a wrapped row would move the rows below
+    it away from where the cursor movements expect them.
+    """
+
+    def __init__(self, out: TextIO = stdout, separator: str = " "):
+        self.out = out
+        self.separator = separator
+        self.previous: Optional[List[Sequence[str]]] = None
+        self.previousWidths: List[List[int]] = []
+        self.previousSize: Optional[terminal_size] = None
+        self.lock = Lock()
+
+    def invalidate(self):
+        self.previous = None
+
+    def render(self, rows: Rows) -> str:
+        """
+        Escape sequences and text to get from the previous rows to these
+        """
+        widths = [[visibleLength(cell) for cell in row] for row in rows]
+        if self.previous is None:
+            out = ["\033[?25l\033[H\033[2J"]
+            for (r, row) in enumerate(rows):
+                out.append(moveTo(r, 0) + self.separator.join(row))
+        else:
+            out = []
+            sep = len(self.separator)
+            for (r, row) in enumerate(rows):
+                old = self.previous[r] if r < len(self.previous) else []
+                oldWidths = self.previousWidths[r] if r < len(self.previous) else []
+                x = 0
+                for (c, cell) in enumerate(row):
+                    if c >= len(old) or old[c] != cell:
+                        if c >= len(old) or oldWidths[c] != widths[r][c]:
+                            # rest of the row moves, write all of it
+                            out.append(
+                                moveTo(r, x) + self.separator.join(row[c:]) + "\033[K"
+                            )
+                            break
+                        out.append(moveTo(r, x) + cell)
+                    x += widths[r][c] + sep
+                else:
+                    if len(old) > len(row):
+                        out.append(moveTo(r, max(0, x - sep)) + "\033[K")
+            for r in range(len(rows), len(self.previous)):
+                out.append(moveTo(r, 0) + "\033[K")
+
+        self.previous = list(rows)
+        self.previousWidths = widths
+        return "".join(out)
+
+    def write(self, text: str):
+        """
+        Write text over the screen, the screen is drawn in full next time
+        """
+        with self.lock:
+            self.out.write(text)
+            self.out.flush()
+            self.previous = None
+
+    def size(self) -> Optional[terminal_size]:
+        """
+        :returns: size of the terminal of out, None if it is not a terminal
+        """
+        try:
+            return get_terminal_size(self.out.fileno())
+        except (OSError, ValueError):
+            return None
+
+    def draw(self, rows: Rows):
+        with self.lock:
+            size = self.size()
+            if size != self.previousSize:
+                self.previous = None
+                self.previousSize = size
+            if size is not None:
+                # one column is left free, erasing the rest of a row that
+                # fills the whole line would erase its last character
+                rows = [
+                    clipRow(row, size.columns - 1, self.separator)
+                    for row in rows[: size.lines]
+                ]
+            self.out.write(self.render(rows))
+            self.out.flush()
@@ -0,0 +1,215 @@
+from collections import deque
+from multiprocessing.connection import Client
+from threading import Condition, Thread
+from tf import eval as tfeval  # type: ignore
+from time import monotonic, sleep
+from traceback import format_exception_only
+from typing import Any, Callable, Deque, List, NamedTuple, Optional
+
+from tfutils import tfprint
+from utils import NoValue
+
+
+class QueuePolicy(NoValue):
+    #: every message matters, the oldest one is dropped when the queue is full
+    DROP_OLDEST = "drop_oldest"
+    #: only the latest message matters, e.g. full state snapshots
+    COALESCE_LATEST = "coalesce_latest"
+
+
+class SenderStats(NamedTuple):
+    queued: int
+    sent: int
+    dropped: int
+    coalesced: int
+    connects: int
+    #: messages that could not be encoded, and the latest error
+    encodeErrors: int
+    lastError: Optional[str]
+
+
+class Sender:
+    """
+    Background writer for one output pane socket
+
+    Trigger handlers only enqueue messages with send(), the writer thread
+    connects lazily, reconnects when the pane is restarted and does the
+    actual writes. A slow or dead pane never blocks TinyFugue.
+    """
+
+    def __init__(
+        self,
+        socketFile: str,
+        policy: QueuePolicy = QueuePolicy.DROP_OLDEST,
+        maxSize: int = 256,
+        encode: Optional[Callable[[Any], bytes]] = None,
+        onConnect: Optional[Callable[[], None]] = None,
+        retrySeconds: float = 1.0,
+        delay: float = 0.0,
+    ):
+        """
+        :param socketFile: unix socket of the output pane
+        :param policy: what to do when messages are coming faster than sent
+        :param maxSize: queue size for QueuePolicy.DROP_OLDEST
+        :param encode: called in the writer thread to get the bytes to be
+                       sent, messages are pickled with Connection.send if None
+        :param onConnect: called in the writer thread after (re)connecting
+        :param retrySeconds: wait between connection attempts
+        :param delay: wait this long after the first queued message so that a
+                      burst of updates can be coalesced, or until flush()
+        """
+        self.socketFile = socketFile
+        self.policy = policy
+        self.maxSize = 1 if policy == QueuePolicy.COALESCE_LATEST else maxSize
+        self.encode = encode
+        self.onConnect = onConnect
+        self.retrySeconds = retrySeconds
+        self.delay = delay
+        self.flushRequested = False
+
+        self.queue: Deque[Any] = deque()
+        self.condition = Condition()
+        self.conn: Any = None
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.connects = 0
+        self.encodeErrors = 0
+        self.lastError: Optional[str] = None
+
+        self.thread = Thread(target=self._run, name="sender " + socketFile)
+        self.thread.daemon = True
+        self.thread.start()
+        SENDERS.append(self)
+
+    def send(self, msg: Any):
+        """
+        Enqueue message for sending, returns immediately
+        """
+        with self.condition:
+            if len(self.queue) >= self.maxSize:
+                self.queue.popleft()
+                if self.policy == QueuePolicy.COALESCE_LATEST:
+                    self.coalesced += 1
+                else:
+                    self.dropped += 1
+            self.queue.append(msg)
+            self.condition.notify()
+
+    def flush(self):
+        """
+        Send the queued messages now instead of waiting for the delay
+        """
+        with self.condition:
+            if len(self.queue) > 0:
+                self.flushRequested = True
+                self.condition.notify()
+
+    def stats(self) -> SenderStats:
+        with self.condition:
+            return SenderStats(
+                len(self.queue),
+                self.sent,
+                self.dropped,
+                self.coalesced,
+                self.connects,
+                self.encodeErrors,
+                self.lastError,
+            )
+
+    def _connect(self):
+        while self.conn is None:
+            try:
+                self.conn = Client(self.socketFile, "AF_UNIX")
+                with self.condition:
+                    self.connects += 1
+                if self.onConnect is not None:
+                    self.onConnect()
+            except OSError:
+                sleep(self.retrySeconds)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while len(self.queue) == 0:
+                    self.condition.wait()
+                if self.delay > 0:
+                    deadline = monotonic() + self.delay
+                    while not self.flushRequested and monotonic() < deadline:
+                        self.condition.wait(deadline - monotonic())
+                msg = self.queue.popleft()
+                if len(self.queue) == 0:
+                    self.flushRequested = False
+
+            self._connect()
+            try:
+                if self.encode is None:
+                    self.conn.send(msg)
+                else:
+                    self.conn.send_bytes(self.encode(msg))
+                with self.condition:
+                    self.sent += 1
+            except (OSError, EOFError):
+                # pane is gone, retry this message after reconnecting unless
+                # there is something newer to be sent instead
+                self.conn.close()
+                self.conn = None
+                with self.condition:
+                    if len(self.queue) < self.maxSize:
+                        self.queue.appendleft(msg)
+                    elif self.policy == QueuePolicy.COALESCE_LATEST:
+                        self.coalesced += 1
+                    else:
+                        self.dropped += 1
+            except Exception as e:
+                # unencodable message, do not let it stop the writer but keep
+                # it apart from the messages dropped when the queue is full
+                with self.condition:
+                    self.encodeErrors += 1
+                    self.lastError = "".join(format_exception_only(type(e), e)).strip()
+
+
+#: all senders of this tf session, for sender_stats
+SENDERS: List[Sender] = []
+
+
+def getSender(socketFile: str, *args, **kwargs) -> Sender:
+    """
+    Sender shared by all the scripts writing to the same socket
+
+    Arguments are passed to Sender when it does not exist yet.
+    """
+    for sender in SENDERS:
+        if sender.socketFile == socketFile:
+            return sender
+    return Sender(socketFile, *args, **kwargs)
+
+
+def printStats(s: str):
+    for sender in SENDERS:
+        stats = sender.stats()
+        tfprint(
+            "{0}: {1} queued, {2} sent, {3} dropped, {4} coalesced, {5} connects".format(
+                sender.socketFile.split("-")[-1],
+                stats.queued,
+                stats.sent,
+                stats.dropped,
+                stats.coalesced,
+                stats.connects,
+            )
+        )
+        if stats.encodeErrors > 0:
+            tfprint(
+                "{0}: {1} encode errors, last: {2}".format(
+                    sender.socketFile.split("-")[-1],
+                    stats.encodeErrors,
+                    stats.lastError,
+                )
+            )
+
+
+def setup():
+    tfeval("/def sender_stats = /python_call sender.printStats")
+
+
+setup()
@@ -1,4 +1,15 @@
-from typing import FrozenSet, List, Mapping, NamedTuple, Optional, Sequence
+from functools import lru_cache
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 from utils import Color, NoValue
 
@@ -854,21 +865,68 @@ SPELLS: FrozenSet[Spell] = frozenset(
 )
 
 
+class SpellRegistry:
+    """
+    Spells indexed by name, type, damage type and vocals, built once
+    """
+
+    def __init__(self, spells: FrozenSet[Spell]):
+        #: by lowercase name
+        self.byName: Dict[str, Spell] = {}
+        self.byType: Dict[Tuple[Optional[DamType], SpellType], Spell] = {}
+        self.byDamType: Dict[Optional[DamType], FrozenSet[Spell]] = {}
+        #: by lowercase vocals, spells without vocals are not included
+        self.byVocals: Dict[str, Spell] = {}
+
+        damTypes: Dict[Optional[DamType], Set[Spell]] = {}
+        for spell in spells:
+            self.byName[spell.name.lower()] = spell
+            if spell.spellType is not None:
+                self.byType[(spell.damType, spell.spellType)] = spell
+            damTypes.setdefault(spell.damType, set()).add(spell)
+            if spell.vocals != "":
+                self.byVocals[spell.vocals.lower()] = spell
+        self.byDamType = {d: frozenset(s) for (d, s) in damTypes.items()}
+
+    def spell(self, name: str) -> Optional[Spell]:
+        return self.byName.get(name.lower())
+
+    def spellOfType(
+        self, damType: Optional[DamType], spellType: SpellType
+    ) -> Optional[Spell]:
+        return self.byType.get((damType, spellType))
+
+    def spellsOfDamType(self, damType: Optional[DamType]) -> FrozenSet[Spell]:
+        return self.byDamType.get(damType, frozenset())
+
+    def spellOfVocals(self, vocals: str) -> Optional[Spell]:
+        return self.byVocals.get(vocals.lower())
+
+
+REGISTRY = SpellRegistry(SPELLS)
+
+
 def getSpellByType(damType: DamType, spellType: SpellType) -> Optional[Spell]:
-    for spell in SPELLS:
-        if spell.damType == damType and spell.spellType == spellType:
-            return spell
-    return None
+    return REGISTRY.spellOfType(damType, spellType)
 
 
 def getSpellByName(name: str) -> Spell:
-    for spell in SPELLS:
-        if spell.name == name:
-            return spell
+    # names are lowercase in SPELLS, other names are not known like before
+    spell = REGISTRY.byName.get(name)
+    if spell is not None:
+        return spell
     return Spell(name, None, None, "", False, False)
 
-def organizeSpells(names: List[str]) -> str:
-    parsedNames = {n.lower() for n in names}
+#: spell summaries kept, more than the monsters with spells in an area
+SUMMARY_CACHE_SIZE = 1024
+
+
+def organizeSpells(names: Iterable[str]) -> str:
+    return summarizeSpells(frozenset(n.lower() for n in names))
+
+
+@lru_cache(maxsize=SUMMARY_CACHE_SIZE)
+def summarizeSpells(parsedNames: FrozenSet[str]) -> str:
     spells = frozenset(map(getSpellByName, parsedNames))
     small_types = frozenset([SpellType.MAGE_SINGLE_2, SpellType.MAGE_SINGLE_3, SpellType.MAGE_SINGLE_4, SpellType.MAGE_SINGLE_5, SpellType.MAGE_SINGLE_6, SpellType.MAGE_SINGLE_7, SpellType.MAGE_SINGLE_8, SpellType.MAGE_AREA_2, SpellType.MAGE_AREA_3])
     smalls = {s for s in spells if s.spellType in small_types}
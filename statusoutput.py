@@ -1,10 +1,11 @@
 from collections import deque  # type: ignore
 import dill  # type: ignore
-from multiprocessing.connection import Listener
 from os import getuid
 from threading import Timer
 from typing import cast
 
+from outputserver import Connection, listen, Pane
+from screen import Screen
 from utils import colorize
 
 STATUS_SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-status".format(getuid())
@@ -16,12 +17,21 @@ def tickStr(i: int) -> str:
     return "{0} {1}".format(i, "#" * i)
 
 
+SCREEN = Screen()
+
+
 def draw(state: State):
-    print("\033c", end="")  # clear screen
-    print(
-        "tick  {0:<14} hb {1:<6}".format(tickStr(state.tick), tickStr(state.heartbeat))
+    SCREEN.draw(
+        [
+            [
+                "tick  {0:<14} hb {1:<6}".format(
+                    tickStr(state.tick), tickStr(state.heartbeat)
+                )
+            ],
+            ["res  {0}".format(state.resists)],
+            ["cast {0}".format(state.casting)],
+        ]
     )
-    print("res  {0}".format(state.resists))
 
 
 def doHeartbeat(resetHeartbeat: bool, resetTick: bool):
@@ -48,6 +58,7 @@ def doHeartbeat(resetHeartbeat: bool, resetTick: bool):
         state.heartbeatTimer.cancel()
 
     heartbeatTimer = Timer(1, doHeartbeat, (False, False))
+    heartbeatTimer.daemon = True
     state = state._replace(
         heartbeat=heartbeat,
         heartbeatTimer=heartbeatTimer,
@@ -62,6 +73,8 @@ def receiveMessage(msg: Message):
     global state
     if msg.statusType == StatusType.RESISTS and msg.message is not None:
         state = state._replace(resists=msg.message)
+    elif msg.statusType == StatusType.CASTING:
+        state = state._replace(casting=msg.message)
     elif msg.statusType == StatusType.HEARTBEAT_RESET:
         doHeartbeat(True, False)
     elif msg.statusType == StatusType.TICK_RESET:
@@ -69,15 +82,19 @@ def receiveMessage(msg: Message):
     draw(state)
 
 
+class StatusPane(Pane):
+    def start(self):
+        state.heartbeatTimer.start()
+
+    def received(self, conn: Connection, data: bytes):
+        receiveMessage(cast(Message, dill.loads(data)))
+
+
 heartbeatTimer = Timer(1, doHeartbeat, (False, False))
-state = State("", 3, 10, heartbeatTimer, False)
-heartbeatTimer.start()
-
-with Listener(STATUS_SOCKET_FILE, "AF_UNIX") as listener:
-    while True:
-        with listener.accept() as conn:
-            try:
-                msg = cast(Message, dill.loads(conn.recv_bytes()))
-                receiveMessage(msg)
-            except EOFError:
-                None
+heartbeatTimer.daemon = True
+state = State("", "", 3, 10, heartbeatTimer, False)
+
+PANE = StatusPane(STATUS_SOCKET_FILE, SCREEN)
+
+if __name__ == "__main__":
+    listen(PANE)
@@ -8,6 +8,7 @@ class StatusType(NoValue):
     RESISTS = "resists"
     HEARTBEAT_RESET = "heartbeat_reset"
     TICK_RESET = "tick_reset"
+    CASTING = "casting"
 
 
 class Message(NamedTuple):
@@ -17,6 +18,8 @@ class Message(NamedTuple):
 
 class State(NamedTuple):
     resists: str
+    #: latest spell recognized from magic words
+    casting: str
     heartbeat: int
     tick: int
     heartbeatTimer: Timer
@@ -1,10 +1,24 @@
+from collections import OrderedDict
 from enum import Enum
 from itertools import chain
-from typing import cast, NamedTuple, Optional, Sequence, TypeVar
-from re import compile as reCompile
+from time import monotonic
+from typing import (
+    cast,
+    Generic,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+from re import compile as reCompile, DOTALL
 
 #: generic type variable, usage example in filterOutNones
 T = TypeVar("T")
+#: key type variable for LruCache
+K = TypeVar("K", bound=Hashable)
 
 
 class Color(NamedTuple):
@@ -58,3 +72,106 @@ def textdecode(s: str) -> str:
         [begin, char, end] = match.groups()
         s = begin + chr(int(char)) + end
     return s
+
+
+#: shell-like word: unquoted characters, backslash escapes and quoted strings
+WORD_RE = reCompile(
+    r"""(?:[^ \t\r\n'"\\]+|\\.|'[^']*'|"(?:[^"\\]+|\\.)*")+""", DOTALL
+)
+WHITESPACE = " \t\r\n"
+WORD_SEGMENT_RE = reCompile(r"""\\(.)|'([^']*)'|"((?:[^"\\]|\\.)*)\"""", DOTALL)
+DOUBLE_QUOTED_ESCAPE_RE = reCompile(r'\\([\\"])')
+
+
+def _unquoteSegment(match) -> str:
+    (escaped, singleQuoted, doubleQuoted) = match.groups()
+    if escaped is not None:
+        return escaped
+    if singleQuoted is not None:
+        return singleQuoted
+    return DOUBLE_QUOTED_ESCAPE_RE.sub(r"\1", doubleQuoted)
+
+
+def _splitSingleQuoted(s: str) -> List[str]:
+    """
+    split for printable strings with only single quotes, which is what
+    quoted party names look like
+    """
+    parts = s.split("'")
+    if len(parts) % 2 == 0:
+        raise ValueError("No closing quotation")
+
+    words: List[str] = []
+    joined = False  # next part continues the previous word
+    for (i, part) in enumerate(parts):
+        if i % 2 == 1:
+            if joined:
+                words[-1] += part
+            else:
+                words.append(part)
+            joined = True
+        elif part != "":
+            pieces = part.split()
+            if joined and part[0] != " " and len(pieces) > 0:
+                words[-1] += pieces.pop(0)
+            words.extend(pieces)
+            joined = part[-1] != " "
+    return words
+
+
+def split(s: str) -> List[str]:
+    """
+    Fast replacement for shlex.split with the same results
+
+    :raises ValueError: for unclosed quotes and trailing backslash
+    """
+    if '"' not in s and "\\" not in s and s.isprintable():
+        if "'" not in s:
+            return s.split()
+        return _splitSingleQuoted(s)
+
+    words = WORD_RE.findall(s)
+    if WORD_RE.sub("", s).strip(WHITESPACE) != "":
+        raise ValueError("No closing quotation or escaped character")
+    return [
+        WORD_SEGMENT_RE.sub(_unquoteSegment, w)
+        if "'" in w or '"' in w or "\\" in w
+        else w
+        for w in words
+    ]
+
+
+class LruCache(Generic[K, T]):
+    """
+    Cache of the most recently used values, values older than ttl seconds
+    are not returned
+    """
+
+    def __init__(self, capacity: int, ttl: float):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.entries: "OrderedDict[K, Tuple[float, T]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K) -> Optional[T]:
+        entry = self.entries.get(key)
+        if entry is None or monotonic() - entry[0] > self.ttl:
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: K, value: T):
+        self.entries[key] = (monotonic(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: K):
+        self.entries.pop(key, None)
+
+    def items(self) -> List[Tuple[K, T]]:
+        return [(key, value) for (key, (_, value)) in self.entries.items()]
@@ -0,0 +1,57 @@
+import dill  # type: ignore
+from os import getuid
+from tf import eval as tfeval  # type: ignore
+from typing import Optional, Sequence, Tuple
+
+from sender import getSender
+from spells import REGISTRY, Spell
+from statustypes import Message, StatusType
+from tfutils import tfprint
+
+STATUS_SOCKET_FILE = "/var/run/user/{0}/bcproxy-tf-scripts-status".format(getuid())
+CONN = getSender(STATUS_SOCKET_FILE, encode=dill.dumps)
+
+UTTERS = " utters the magic words '"
+
+
+def recognize(line: str) -> Optional[Tuple[str, Spell]]:
+    """
+    :returns: caster and spell of a magic words line, None if the vocals are
+              not known
+    """
+    (caster, utters, words) = line.rstrip(".").partition(UTTERS)
+    if utters == "" or not words.endswith("'"):
+        return None
+    spell = REGISTRY.spellOfVocals(words[:-1])
+    if spell is None:
+        return None
+    return (caster, spell)
+
+
+def casting(caster: str, spell: Spell) -> str:
+    if spell.damType is not None:
+        return "{0} is casting {1} ({2})".format(
+            caster, spell.name, spell.damType.value
+        )
+    else:
+        return "{0} is casting {1}".format(caster, spell.name)
+
+
+def utters(line: str):
+    recognized = recognize(line)
+    if recognized is not None:
+        CONN.send(Message(StatusType.CASTING, casting(*recognized)))
+
+
+def setup():
+    cmds: Sequence[str] = [
+        "/def -i -F -p10 -mglob -t`* utters the magic words '*'*` vocals_utters = /python_call vocals.utters \%*",
+    ]
+
+    for cmd in cmds:
+        tfeval(cmd)
+
+    tfprint("Loaded vocals.py")
+
+
+setup()